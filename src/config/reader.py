@@ -1,29 +1,88 @@
 import os
+import re
+import glob
+import json
+import mmap
 import yaml
-from typing import Dict, Any
+from types import MappingProxyType
+from typing import Dict, Any, Tuple
+
+# 优先使用 libyaml 的 C 解析器，未编译 libyaml 时退回纯 Python 实现
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
+# .env 解析缓存: 路径 -> ((mtime_ns, size), 解析结果)，文件被修改后自动失效
+# load_env 每次返回副本，调用方修改返回值不会污染缓存
+_ENV_CACHE: Dict[str, Tuple[Tuple[int, int], Dict[str, str]]] = {}
+
+# 一次性匹配整份 .env 的 KEY=VALUE 行（跳过空行与 # 注释行）
+_ENV_LINE_RE = re.compile(rb'^[ \t]*([^#=\s][^=\n]*)=(.*)$', re.MULTILINE)
 
 def load_env(env_path: str) -> Dict[str, str]:
+    try:
+        st = os.stat(env_path)
+    except OSError:
+        return {}
+    stamp = (st.st_mtime_ns, st.st_size)
+    cached = _ENV_CACHE.get(env_path)
+    if cached is not None and cached[0] == stamp:
+        return dict(cached[1])
+
     env_vars = {}
-    if not os.path.exists(env_path):
-        return env_vars
-    with open(env_path, 'r', encoding='utf-8') as f:
-        for line in f:
-            line = line.strip()
-            if not line or line.startswith('#'):
-                continue
-            if '=' in line:
-                key, value = line.split('=', 1)
-                env_vars[key.strip()] = value.strip()
-    return env_vars
+    if st.st_size:
+        # 直接在页缓存映射上做正则匹配，省去用户态读缓冲的拷贝
+        with open(env_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for key, value in _ENV_LINE_RE.findall(mm):
+                env_vars[key.strip().decode('utf-8')] = value.strip().decode('utf-8')
+    _ENV_CACHE[env_path] = (stamp, env_vars)
+    return dict(env_vars)
+
+def _write_yaml_cache(config_path: str, cache_path: str, data: Dict[str, Any]) -> None:
+    """把解析结果写成 JSON 缓存（原子替换），并清理旧版本的缓存；失败时静默放弃。"""
+    try:
+        text = json.dumps(data, ensure_ascii=False)
+        # JSON 表达不了的内容（日期、非字符串键等）不缓存，避免读回时类型走样
+        if json.loads(text) != data:
+            return
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, cache_path)
+        for stale in glob.glob(glob.escape(config_path) + ".*.json"):
+            if stale != cache_path:
+                os.remove(stale)
+    except (OSError, TypeError, ValueError):
+        pass
+
+def _yaml_cache_path(config_path: str, st: os.stat_result) -> str:
+    # 与 .env 缓存一致按 (mtime_ns, size) 区分版本，时间戳精度粗的文件系统上也能识别多数修改
+    return f"{config_path}.{st.st_mtime_ns}-{st.st_size}.json"
 
 def load_yaml_config(config_path: str) -> Dict[str, Any]:
-    if not os.path.exists(config_path):
+    """
+    读取 YAML 配置。解析结果以 JSON 缓存在同目录的 {config_path}.{mtime_ns}-{size}.json，
+    Web 进程与 Worker 子进程启动时命中缓存即可跳过 YAML 解析；YAML 被修改后缓存自然失效。
+    """
+    try:
+        st = os.stat(config_path)
+    except OSError:
         return {}
+    cache_path = _yaml_cache_path(config_path, st)
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        pass
+
     with open(config_path, 'r', encoding='utf-8') as f:
         try:
-            return yaml.safe_load(f) or {}
+            data = yaml.load(f, Loader=_YamlLoader) or {}
         except yaml.YAMLError:
             return {}
+    _write_yaml_cache(config_path, cache_path, data)
+    return data
 
 # 路径配置 — 多一层 dirname 因为从 src/ 移到了 src/config/
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -36,10 +95,11 @@ YAML_CONFIG = load_yaml_config(CONFIG_YAML_PATH)
 
 def save_env(env_path: str, data: Dict[str, str]) -> None:
     """更新或保存 .env 文件"""
-    lines = []
-    if os.path.exists(env_path):
+    try:
         with open(env_path, 'r', encoding='utf-8') as f:
             lines = f.readlines()
+    except FileNotFoundError:
+        lines = []
 
     new_lines = []
     processed_keys = set()
@@ -51,8 +111,8 @@ def save_env(env_path: str, data: Dict[str, str]) -> None:
             new_lines.append(line)
             continue
         
-        if '=' in line:
-            key, _ = stripped.split('=', 1)
+        key, sep, _ = stripped.partition('=')
+        if sep:
             key = key.strip()
             if key in data:
                 new_lines.append(f"{key}={data[key]}\n")
@@ -72,6 +132,7 @@ def save_env(env_path: str, data: Dict[str, str]) -> None:
             
     with open(env_path, 'w', encoding='utf-8') as f:
         f.writelines(new_lines)
+    _ENV_CACHE.pop(env_path, None)
 
 def save_yaml_config(config_path: str, data: Dict[str, Any]) -> None:
     """更新或保存 config.yaml 文件"""
@@ -81,6 +142,11 @@ def save_yaml_config(config_path: str, data: Dict[str, Any]) -> None:
     
     with open(config_path, 'w', encoding='utf-8') as f:
         yaml.safe_dump(current_config, f, allow_unicode=True, default_flow_style=False)
+    # 直接用写入的内容刷新缓存：同一时间戳刻度内保存时，旧缓存可能仍与新文件同键
+    try:
+        _write_yaml_cache(config_path, _yaml_cache_path(config_path, os.stat(config_path)), current_config)
+    except OSError:
+        pass
 
 
 
@@ -95,17 +161,19 @@ ATOMIC_WAIT_SECONDS = 7
 RPC_PORT = 9999
 RPC_HOST = "127.0.0.1"
 
-# CTP 配置
-CTP_SETTING = {
-    "用户名": CTP_USERNAME,
-    "密码": ENV_VARS.get("CTP_PASSWORD", ""),
-    "经纪商代码": CTP_BROKER_ID,
-    "交易服务器": CTP_TD_SERVER,
-    "行情服务器": ENV_VARS.get("CTP_MD_SERVER", ""),
-    "产品名称": CTP_APP_ID,
-    "授权编码": CTP_AUTH_CODE,
-    "产品信息": ENV_VARS.get("CTP_PRODUCT_INFO", "")
-}
+# CTP 配置: (vnpy 网关设置项, .env 键)
+_CTP_SETTING_KEYS = (
+    ("用户名", "CTP_USERNAME"),
+    ("密码", "CTP_PASSWORD"),
+    ("经纪商代码", "CTP_BROKER_ID"),
+    ("交易服务器", "CTP_TD_SERVER"),
+    ("行情服务器", "CTP_MD_SERVER"),
+    ("产品名称", "APPID"),
+    ("授权编码", "CTP_AUTH_CODE"),
+    ("产品信息", "CTP_PRODUCT_INFO"),
+)
+# 只读视图：导入时定型，多线程只读共享无需加锁，也防止调用方误改
+CTP_SETTING = MappingProxyType({name: ENV_VARS.get(env_key, "") for name, env_key in _CTP_SETTING_KEYS})
 
 # 从 YAML 读取测试配置
 TEST_SYMBOL = YAML_CONFIG.get("test_symbol", "IF2602")
@@ -117,13 +185,17 @@ VOLUME_LIMIT_VOLUME = int(YAML_CONFIG.get("volume_limit_volume", 10000) or 10000
 ORDER_MONITOR_THRESHOLD = int(YAML_CONFIG.get("order_monitor_threshold", 1) or 1)
 CANCEL_MONITOR_THRESHOLD = int(YAML_CONFIG.get("cancel_monitor_threshold", 1) or 1)
 
+# 本地风控直接拦截的无效合约代码（在内置的 INVALID_CODE/INVALID 之外追加）
+BAD_SYMBOLS = [str(s) for s in (YAML_CONFIG.get("bad_symbols") or [])]
+
 # 市场状态错误测试配置
 REST_TEST_SYMBOL = YAML_CONFIG.get("rest_test_symbol", "LC2607")
 REST_TEST_PRICE = float(YAML_CONFIG.get("rest_test_price", 168220))
 
 # 从 YAML 读取风控阈值
-RISK_THRESHOLDS = YAML_CONFIG.get("risk_thresholds", {
+# 运行期阈值由 TestRiskManager.set_thresholds 修改其自身属性，这里只作为只读初始值
+RISK_THRESHOLDS = MappingProxyType(dict(YAML_CONFIG.get("risk_thresholds") or {
     "max_order_count": 5,
     "max_cancel_count": 5,
     "max_symbol_order_count": 2
-})
+}))
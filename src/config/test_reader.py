@@ -0,0 +1,117 @@
+"""Unit tests for src/config/reader.py"""
+
+import os
+
+from src.config import reader
+
+
+class TestLoadEnv:
+    def test_missing_file_returns_empty(self, tmp_path):
+        assert reader.load_env(str(tmp_path / "missing.env")) == {}
+
+    def test_parses_key_values(self, tmp_path):
+        env = tmp_path / ".env"
+        env.write_text("# comment\n\nCTP_NAME = xx期货\nCTP_TD_SERVER=127.0.0.1:1234\nNOEQUALS\n", encoding="utf-8")
+
+        assert reader.load_env(str(env)) == {
+            "CTP_NAME": "xx期货",
+            "CTP_TD_SERVER": "127.0.0.1:1234",
+        }
+
+    def test_value_may_contain_equals(self, tmp_path):
+        env = tmp_path / ".env"
+        env.write_text("CTP_PASSWORD=a=b=c\n", encoding="utf-8")
+
+        assert reader.load_env(str(env)) == {"CTP_PASSWORD": "a=b=c"}
+
+    def test_skips_commented_assignments(self, tmp_path):
+        env = tmp_path / ".env"
+        env.write_text("# CTP_NAME=old\n   # APPID=x\nCTP_NAME=new\r\n", encoding="utf-8")
+
+        assert reader.load_env(str(env)) == {"CTP_NAME": "new"}
+
+    def test_cached_until_file_changes(self, tmp_path):
+        env = tmp_path / ".env"
+        env.write_text("CTP_NAME=first\n", encoding="utf-8")
+        path = str(env)
+
+        first = reader.load_env(path)
+        assert reader.load_env(path) == first
+        assert reader._ENV_CACHE[path][1] == first
+
+        env.write_text("CTP_NAME=second-value\n", encoding="utf-8")
+        st = os.stat(path)
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+
+        assert reader.load_env(path) == {"CTP_NAME": "second-value"}
+
+    def test_caller_mutation_does_not_leak_into_cache(self, tmp_path):
+        env = tmp_path / ".env"
+        env.write_text("CTP_NAME=first\n", encoding="utf-8")
+        path = str(env)
+
+        reader.load_env(path)["CTP_NAME"] = "mutated"
+        cached = reader.load_env(path)
+        cached["EXTRA"] = "x"
+
+        assert reader.load_env(path) == {"CTP_NAME": "first"}
+
+    def test_save_env_invalidates_cache(self, tmp_path):
+        env = tmp_path / ".env"
+        env.write_text("CTP_NAME=first\n", encoding="utf-8")
+        path = str(env)
+
+        reader.load_env(path)
+        reader.save_env(path, {"CTP_NAME": "other"})
+
+        assert reader.load_env(path) == {"CTP_NAME": "other"}
+
+    def test_empty_file_returns_empty(self, tmp_path):
+        env = tmp_path / ".env"
+        env.write_bytes(b"")
+
+        assert reader.load_env(str(env)) == {}
+
+
+class TestLoadYamlConfig:
+    def test_missing_file_returns_empty(self, tmp_path):
+        assert reader.load_yaml_config(str(tmp_path / "missing.yaml")) == {}
+
+    def test_parse_writes_json_cache(self, tmp_path):
+        cfg = tmp_path / "config.yaml"
+        cfg.write_text("test_symbol: IF2602\nrisk_thresholds:\n  max_order_count: 5\n", encoding="utf-8")
+        path = str(cfg)
+
+        expected = {"test_symbol": "IF2602", "risk_thresholds": {"max_order_count": 5}}
+        assert reader.load_yaml_config(path) == expected
+
+        st = os.stat(path)
+        cache = tmp_path / f"config.yaml.{st.st_mtime_ns}-{st.st_size}.json"
+        assert cache.exists()
+        assert reader.load_yaml_config(path) == expected
+
+    def test_modified_yaml_replaces_stale_cache(self, tmp_path):
+        cfg = tmp_path / "config.yaml"
+        cfg.write_text("safe_buy_price: 4700\n", encoding="utf-8")
+        path = str(cfg)
+        reader.load_yaml_config(path)
+
+        cfg.write_text("safe_buy_price: 4600\n", encoding="utf-8")
+        st = os.stat(path)
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+
+        assert reader.load_yaml_config(path) == {"safe_buy_price": 4600}
+        assert len(list(tmp_path.glob("config.yaml.*.json"))) == 1
+
+    def test_save_refreshes_cache_with_same_stat_key(self, tmp_path):
+        cfg = tmp_path / "config.yaml"
+        cfg.write_text("test_symbol: IF2602\n", encoding="utf-8")
+        path = str(cfg)
+        reader.load_yaml_config(path)
+        st = os.stat(path)
+
+        reader.save_yaml_config(path, {"test_symbol": "IF2603"})
+        # 模拟粗粒度时间戳：保存后 mtime 未变、大小相同
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+        assert reader.load_yaml_config(path) == {"test_symbol": "IF2603"}
@@ -1,19 +1,33 @@
 import src.path_setup  # noqa: F401 — must be first to override pip vnpy
+import logging
 import threading
 import time
-from typing import Dict, Optional, List, Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Dict, FrozenSet, Optional, List, Callable, Mapping, Tuple
 from vnpy.event import EventEngine, Event
-from vnpy.trader.engine import MainEngine
 from vnpy.trader.event import EVENT_LOG, EVENT_CONTRACT, EVENT_ORDER, EVENT_TRADE, EVENT_POSITION, EVENT_ACCOUNT
 from vnpy.trader.object import OrderRequest, CancelRequest, SubscribeRequest, ContractData, OrderData, TradeData, LogData, AccountData
 from vnpy.trader.constant import Status
-from vnpy_ctptest import CtptestGateway
+
+if TYPE_CHECKING:
+    # MainEngine（设置/日志/数据目录初始化）与 CTP C 扩展较重，推迟到创建 TestEngine 时再导入
+    from vnpy.trader.engine import MainEngine
 
 from src.config import reader as config
 from src.logging import log_info, log_error, log_warning
 from src.core.risk import TestRiskManager
 from src.ctp_cases.helpers import wait_for_reaction
 
+# self.orders 最多保留的订单数，防止长时间会话下内存无界增长
+MAX_TRACKED_ORDERS = 100_000
+
+# 终态（不再可撤）
+_TERMINAL_STATES = frozenset((Status.ALLTRADED, Status.CANCELLED, Status.REJECTED))
+
+# 柜台已确认（挂单/部分成交/终态），供 wait_for_order 等待挂单生效
+ACK_STATES = _TERMINAL_STATES | {Status.NOTTRADED, Status.PARTTRADED}
+
 class TestEngine:
     """
     渗透测试的核心引擎。
@@ -24,40 +38,70 @@ class TestEngine:
     - 事件处理
     """
     def __init__(self):
+        from vnpy.trader.engine import MainEngine
+        from vnpy_ctptest import CtptestGateway
+
+        self._gateway_class = CtptestGateway
         self.event_engine = EventEngine()
-        self.main_engine = MainEngine(self.event_engine)
+        self.main_engine: "MainEngine" = MainEngine(self.event_engine)
         self.main_engine.add_gateway(CtptestGateway)
         self.gateway_name = "CTPTEST"
+        self._vt_prefix = f"{self.gateway_name}."
+        self._gateway = self.main_engine.get_gateway(self.gateway_name)
         
         self.risk_manager = TestRiskManager(self)
+
+        # 连接控制（connect/disconnect/reconnect）专用单线程执行器，避免阻塞 RPC/Web 请求线程
+        self._control_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ctp-ctl")
+        # on_order 中按订单状态分发的处理函数
+        self._status_handlers: Dict[Status, Callable[[OrderData], None]] = {
+            Status.CANCELLED: self.risk_manager.on_order_cancelled,
+        }
         
         # 状态
         self.contract: Optional[ContractData] = None
         self.rest_test_contract: Optional[ContractData] = None
-        self.orders: Dict[str, OrderData] = {}
+        self._symbol_targets: Dict[str, str] = {}  # 合约代码 -> 保存该合约的属性名
+        self.reload_config()
+        self.orders: Dict[str, OrderData] = {}  # 按首次出现顺序，最多保留 MAX_TRACKED_ORDERS 笔
+        # 活动订单索引，避免全量扫描 orders。仅事件线程写入：
+        # 成员增删时复制一份新字典再整体替换引用；已有订单的状态更新直接替换值（不改变字典大小），
+        # 其他线程遍历 _active_orders 快照时无需加锁
+        self._active: Dict[str, OrderData] = {}
+        self._active_orders: Mapping[str, OrderData] = MappingProxyType(self._active)
         self.last_account_data = None  # (balance, available)
         self.account: Optional[AccountData] = None # 缓存最新的账户信息
-        self.session_order_ids = set() # 记录本次会话发出的订单ID
+        self.session_order_ids: Dict[str, None] = {}  # 记录本次会话发出的订单ID（有序，最多 MAX_TRACKED_ORDERS 个）
+
+        # 用例等待：vt_orderid -> (目标状态集合, Event)；合约就绪事件
+        self._order_waiters: Dict[str, Tuple[FrozenSet[Status], threading.Event]] = {}
+        self._contract_ready = threading.Event()
         
         # 错误码处理
         self.rejected_orders: Dict[str, OrderData] = {}
         self._on_reject_callbacks: List[Callable] = []
         
-        # 事件钩子
-        self.event_engine.register(EVENT_LOG, self.on_log)
-        self.event_engine.register(EVENT_ORDER, self.on_order)
-        self.event_engine.register(EVENT_TRADE, self.on_trade)
-        self.event_engine.register(EVENT_CONTRACT, self.on_contract)
-        self.event_engine.register(EVENT_ACCOUNT, self.on_account)
+        # 事件钩子：EventEngine 本身已按 event.type 查表分发，
+        # 直接按类型注册即可做到每个事件只调用一次处理函数
+        self._handlers: Dict[str, Callable[[Event], None]] = {
+            EVENT_LOG: self.on_log,
+            EVENT_ORDER: self.on_order,
+            EVENT_TRADE: self.on_trade,
+            EVENT_CONTRACT: self.on_contract,
+            EVENT_ACCOUNT: self.on_account,
+        }
+        for event_type, handler in self._handlers.items():
+            self.event_engine.register(event_type, handler)
 
     def connect(self):
         log_info("正在连接 CTP 测试环境...")
         # 确保网关实例存在
-        gateway = self.main_engine.get_gateway(self.gateway_name)
-        if not gateway:
+        if not self.main_engine.get_gateway(self.gateway_name):
             log_info("Initializing CtptestGateway...")
-            self.main_engine.add_gateway(CtptestGateway)
-            
+            self.main_engine.add_gateway(self._gateway_class)
+        self._gateway = self.main_engine.get_gateway(self.gateway_name)
+        self.reload_config()
+
         self.main_engine.connect(config.CTP_SETTING, self.gateway_name)
 
     def disconnect(self):
@@ -68,6 +112,7 @@ class TestEngine:
         # 1. 不调用 close()，任由旧连接在后台（可能泄露，但测试场景可接受）
         # 2. 直接从引擎移除网关引用
         
+        self._gateway = None
         if self.gateway_name in self.main_engine.gateways:
             self.main_engine.gateways.pop(self.gateway_name)
             log_info("网关实例已从引擎逻辑移除 (跳过物理关闭以防卡死)。")
@@ -79,32 +124,54 @@ class TestEngine:
 
     def reconnect(self):
         log_info("正在执行重连操作 (RECONNECT)...")
-        # 强制垃圾回收 (尝试性)
-        import gc
-        gc.collect()
-        
         # 重新连接 (会自动触发 connect 中的 add_gateway)
         self.connect()
 
+    def _submit_control(self, func: Callable[[], None]) -> Future:
+        future = self._control_executor.submit(func)
+
+        def _log_failure(f: Future):
+            error = f.exception()
+            if error is not None:
+                log_error("%s 执行异常: %s", func.__name__, error)
+
+        future.add_done_callback(_log_failure)
+        return future
+
+    def async_connect(self) -> Future:
+        """在控制线程中执行 connect()，立即返回 Future。"""
+        return self._submit_control(self.connect)
+
+    def async_disconnect(self) -> Future:
+        """在控制线程中执行 disconnect()，立即返回 Future。"""
+        return self._submit_control(self.disconnect)
+
+    def async_reconnect(self) -> Future:
+        """在控制线程中执行 reconnect()，立即返回 Future。"""
+        return self._submit_control(self.reconnect)
+
     def pause(self):
         log_info("正在执行暂停交易操作 (PAUSE)...")
         self.risk_manager.emergency_stop()
 
     def send_order(self, req: OrderRequest) -> str:
         if self.risk_manager.check_order(req):
-            gateway = self.main_engine.get_gateway(self.gateway_name)
+            gateway = self._gateway
             if gateway:
                 returned_id = gateway.send_order(req)
                 vt_orderid = str(returned_id or "").strip()
                 if vt_orderid and "." not in vt_orderid:
-                    vt_orderid = f"{self.gateway_name}.{vt_orderid}"
+                    vt_orderid = self._vt_prefix + vt_orderid
 
-                log_info(f"【发单】{req.symbol} {req.direction.value} Price:{req.price} -> ID:{vt_orderid}")
+                log_info("【发单】%s %s Price:%s -> ID:%s", req.symbol, req.direction.value, req.price, vt_orderid)
                 
                 # 在风控管理器中注册订单以进行会话追踪
                 if vt_orderid:
                     self.risk_manager.register_order(vt_orderid)
-                    self.session_order_ids.add(vt_orderid)
+                    ids = self.session_order_ids
+                    ids[vt_orderid] = None
+                    if len(ids) > MAX_TRACKED_ORDERS:
+                        ids.pop(next(iter(ids)))
                 
                 return vt_orderid
         else:
@@ -114,45 +181,63 @@ class TestEngine:
     def cancel_order(self, req: CancelRequest):
         if self.risk_manager.check_cancel(req):
             self.risk_manager.register_cancel_request(req)
-            gateway = self.main_engine.get_gateway(self.gateway_name)
+            gateway = self._gateway
             if gateway:
-                log_info(f"【撤单】Req Cancel OrderID: {req.orderid}")
+                log_info("【撤单】Req Cancel OrderID: %s", req.orderid)
                 gateway.cancel_order(req)
         else:
             log_warning("撤单被风控管理器拒绝。")
 
     def subscribe(self, req: SubscribeRequest):
-        gateway = self.main_engine.get_gateway(self.gateway_name)
+        gateway = self._gateway
         if gateway:
             gateway.subscribe(req)
-            log_info(f"Subscribed to {req.symbol}")
+            log_info("Subscribed to %s", req.symbol)
 
     def on_log(self, event: Event):
         log: LogData = event.data
-        # 我们将所有底层日志记录到我们的文件中
-        # 如果 logger 已经处理了 stdout，则避免重复打印，
-        # 但 vnpy 日志可能有助于清晰查看。
-        # logger.py 处理格式化，所以我们只传递消息。
-        # 检查是否为错误
-        msg = f"[Gateway] {log.msg}"
-        log_info(msg)
+        # 我们将底层日志记录到我们的文件中（DEBUG 级别在源头丢弃）。
+        # log_info 只是入队，写文件由日志监听线程完成。
+        if log.level < logging.INFO:
+            return
+        log_info("[Gateway] %s", log.msg)
+
+    def _publish_active(self, active: Dict[str, OrderData]) -> None:
+        """活动订单成员变化时发布新快照。"""
+        self._active = active
+        self._active_orders = MappingProxyType(active)
 
     def on_order(self, event: Event):
         order: OrderData = event.data
-        self.orders[order.vt_orderid] = order
-        
+        vt_orderid = order.vt_orderid
+        status = order.status
+        orders = self.orders
+        orders[vt_orderid] = order
+        if len(orders) > MAX_TRACKED_ORDERS:
+            # 淘汰最早出现的订单；活动订单仍保留在 _active_orders 快照中
+            orders.pop(next(iter(orders)))
+        active = self._active
+        if status in _TERMINAL_STATES:
+            if vt_orderid in active:
+                active = dict(active)
+                del active[vt_orderid]
+                self._publish_active(active)
+        elif vt_orderid in active:
+            active[vt_orderid] = order
+        else:
+            active = dict(active)
+            active[vt_orderid] = order
+            self._publish_active(active)
+
         # 仅当订单是本次会话产生的才打印日志
-        if order.vt_orderid in self.session_order_ids:
-            log_info(f"-> 收到委托回报: {order.vt_orderid} Status:{order.status.value}")
-        
-        if order.status == "AllTraded" or order.status == "PartTraded":
-            pass # 在 trade 中处理
+        if vt_orderid in self.session_order_ids:
+            log_info("-> 收到委托回报: %s Status:%s", vt_orderid, status.value)
         
         # === 新增：错误码处理 ===
         try:
             self._process_rejection(order)
         except Exception as e:
-            log_error(f"错误码处理异常: {e}")
+            log_error("错误码处理异常: %s", e)
         
         # 更新风控管理器
         # 我们需要检测“已提交”（刚发送）与“已撤销”
@@ -167,28 +252,54 @@ class TestEngine:
         # on_order_cancelled -> count++ 并打印日志
         
         self.risk_manager.on_order_submitted(order)
-        if order.status == Status.CANCELLED:
-            self.risk_manager.on_order_cancelled(order)
+        # 按状态分发（成交类状态在 on_trade 中处理，不在表中）
+        handler = self._status_handlers.get(status)
+        if handler:
+            handler(order)
+
+        # 最后才唤醒 wait_for_order：回报日志、错误码与风控计数都已处理完，用例线程随后的日志不会抢在前面
+        if self._order_waiters:
+            waiter = self._order_waiters.get(vt_orderid)
+            if waiter and status in waiter[0]:
+                waiter[1].set()
 
     def on_trade(self, event: Event):
         trade: TradeData = event.data
-        vt_orderid = getattr(trade, "vt_orderid", "") or ""
-        if not vt_orderid and getattr(trade, "orderid", None):
-            vt_orderid = f"{self.gateway_name}.{trade.orderid}"
+        # TradeData 在 __post_init__ 中总会生成 vt_orderid，直接读取；
+        # 仅在缺失/为空时才回退到由 orderid 拼接
+        try:
+            vt_orderid = trade.vt_orderid
+        except AttributeError:
+            vt_orderid = ""
+        if not vt_orderid:
+            orderid = getattr(trade, "orderid", None)
+            vt_orderid = self._vt_prefix + str(orderid) if orderid else ""
 
         if vt_orderid in self.session_order_ids:
-            log_info(f"-> 收到成交回报: {vt_orderid} {trade.vt_tradeid} Price:{trade.price} Vol:{trade.volume}")
+            log_info("-> 收到成交回报: %s %s Price:%s Vol:%s", vt_orderid, trade.vt_tradeid, trade.price, trade.volume)
 
     def on_contract(self, event: Event):
         contract: ContractData = event.data
-        # 仅处理测试目标合约
-        if contract.symbol == config.TEST_SYMBOL:
-            self.contract = contract
-            log_info(f"Contract found: {contract.vt_symbol}")
-        elif contract.symbol == config.REST_TEST_SYMBOL:
-            self.rest_test_contract = contract
-            log_info(f"Rest Test Contract found: {contract.vt_symbol}")
-        # 其他合约静默处理，避免日志刷屏
+        # 仅处理测试目标合约，其他合约静默处理，避免日志刷屏
+        slot = self._symbol_targets.get(contract.symbol)
+        if slot is None:
+            return
+        setattr(self, slot, contract)
+        if slot == "contract":
+            self._contract_ready.set()
+            log_info("Contract found: %s", contract.vt_symbol)
+        else:
+            log_info("Rest Test Contract found: %s", contract.vt_symbol)
+
+    def reload_config(self):
+        """
+        重新读取运行期可修改的测试配置（目标合约代码）。
+        on_contract 只查本地映射，不再逐事件访问 config 模块属性。
+        """
+        self._symbol_targets = {
+            config.REST_TEST_SYMBOL: "rest_test_contract",
+            config.TEST_SYMBOL: "contract",  # 后写入，与测试合约同名时优先
+        }
 
     def on_account(self, event: Event):
         # 仅缓存数据，不再自动打印日志
@@ -197,39 +308,62 @@ class TestEngine:
     def log_current_account(self):
         """主动打印当前账户资金"""
         if self.account:
-             log_info(f"-> 账户资金: 余额={self.account.balance} 可用={self.account.available}")
+             log_info("-> 账户资金: 余额=%s 可用=%s", self.account.balance, self.account.available)
         else:
              log_info("-> 尚未获取到账户资金信息")
 
+    def wait_for_order(self, vt_orderid: str, timeout: float, statuses: FrozenSet[Status] = _TERMINAL_STATES) -> bool:
+        """
+        阻塞直到订单进入 statuses 中的任一状态（默认终态），或超时。
+        返回是否在超时前等到；vt_orderid 为空（如被风控拦截）时立即返回 False。
+        """
+        if not vt_orderid:
+            return False
+        event = threading.Event()
+        # 先登记再检查当前状态，避免回报恰好在两者之间到达而错过
+        self._order_waiters[vt_orderid] = (statuses, event)
+        try:
+            order = self.orders.get(vt_orderid)
+            if order is not None and order.status in statuses:
+                return True
+            return event.wait(timeout)
+        finally:
+            self._order_waiters.pop(vt_orderid, None)
+
+    def wait_for_contract(self, timeout: float) -> bool:
+        """等待测试合约信息就绪，返回是否已获取到合约。"""
+        if self.contract is None:
+            self._contract_ready.wait(timeout)
+        return self.contract is not None
+
     def get_all_active_orders(self) -> List[OrderData]:
-        return [o for o in self.orders.values() if o.is_active()]
+        return list(self._active_orders.values())
 
     def _process_rejection(self, order: OrderData):
         """
         处理被拒绝的订单，执行日志记录、存储、风控通知和事件发射。
         """
-        reject_code = getattr(order, 'reject_code', None)
-        status_msg = getattr(order, 'status_msg', '') or ''
-        
+        # 绝大多数回报不是拒单：先做最便宜的判断，命中再读取其余字段
         # 条件1: 有明确的 reject_code
         # 条件2: 状态为 REJECTED
-        has_reject = reject_code is not None
-        is_rejected_status = order.status == Status.REJECTED
-        
-        if not has_reject and not is_rejected_status:
+        status = order.status
+        reject_code = getattr(order, 'reject_code', None)
+        if reject_code is None and status is not Status.REJECTED:
             # 对于非拒绝订单，如果 status_msg 非空且包含有用信息，记录诊断日志
-            if status_msg and order.status == Status.CANCELLED:
-                log_info(f"【委托状态】{order.vt_orderid} 已撤销, StatusMsg: {status_msg}")
+            if status is Status.CANCELLED:
+                status_msg = getattr(order, 'status_msg', '') or ''
+                if status_msg:
+                    log_info("【委托状态】%s 已撤销, StatusMsg: %s", order.vt_orderid, status_msg)
             return
-        
+
+        status_msg = getattr(order, 'status_msg', '') or ''
         reject_reason = getattr(order, 'reject_reason', '') or ''
         
         # 1. 日志记录
         log_warning(
-            f"【CTP拒绝】{order.vt_orderid} "
-            f"错误码:{reject_code} 原因:{reject_reason} "
-            f"合约:{order.symbol} 方向:{order.direction.value} "
-            f"价格:{order.price} 数量:{order.volume}"
+            "【CTP拒绝】%s 错误码:%s 原因:%s 合约:%s 方向:%s 价格:%s 数量:%s",
+            order.vt_orderid, reject_code, reject_reason,
+            order.symbol, order.direction.value, order.price, order.volume,
         )
         
         # 2. 存储
@@ -253,7 +387,7 @@ class TestEngine:
             try:
                 cb(event_payload)
             except Exception as e:
-                log_error(f"错误事件回调异常: {e}")
+                log_error("错误事件回调异常: %s", e)
 
     def get_rejected_orders(self) -> List[OrderData]:
         """
@@ -268,4 +402,5 @@ class TestEngine:
         self._on_reject_callbacks.append(callback)
 
     def close(self):
+        self._control_executor.shutdown(wait=False)
         self.main_engine.close()
@@ -1,7 +1,17 @@
+import sys
+import threading
+from math import fabs, remainder
+from collections import Counter
 from vnpy.trader.object import OrderRequest, CancelRequest, OrderData
 from src.logging import log_info, log_warning, log_error
 from src.config import reader as config
- 
+
+# 会话订单 ID 最多保留的数量，超出后淘汰最早登记的
+MAX_SESSION_ORDERS = 100_000
+
+# 合约代码检查：命中即视为无效合约
+_BAD_SYMBOLS = frozenset({"INVALID_CODE", "INVALID", *config.BAD_SYMBOLS})
+
 class TestRiskManager:
     """
     渗透测试的风控模块。
@@ -11,55 +21,135 @@ class TestRiskManager:
     - 紧急停止（暂停交易）
     - 无效订单检查（价格 Tick、合约代码）
     """
+    __slots__ = (
+        "active", "tester",
+        "order_count", "cancel_count", "repeat_order_count", "repeat_cancel_count", "rejection_count",
+        "max_order_count", "max_cancel_count", "max_repeat_count",
+        "order_signature_count", "cancel_signature_count",
+        "_last_order_sig", "_last_order_sig_count", "_last_cancel_sig", "_last_cancel_sig_count",
+        "_tick_contract", "_inv_price_tick",
+        "session_order_ids", "_cancel_cond",
+        "last_log_order_count", "last_log_cancel_count",
+        "_warned_order_threshold", "_warned_cancel_threshold", "_warned_repeat_threshold",
+        "_order_gate_open", "_cancel_gate_open", "_repeat_gate_open",
+    )
+
     def __init__(self, tester=None):
         self.active = True
         self.tester = tester
         
         # 计数器
-        self.order_count = 0
-        self.cancel_count = 0
-        self.repeat_order_count = 0
-        self.repeat_cancel_count = 0
-        self.rejection_count = 0
+        self._reset_counts()
         
-        # 阈值
-        self.max_order_count = config.RISK_THRESHOLDS.get("max_order_count", 5)
-        self.max_cancel_count = config.RISK_THRESHOLDS.get("max_cancel_count", 5)
-        self.max_repeat_count = config.RISK_THRESHOLDS.get(
+        # 阈值（构造与 set_thresholds 时统一转为 int，热路径不再转换）
+        self.max_order_count = int(config.RISK_THRESHOLDS.get("max_order_count", 5) or 0)
+        self.max_cancel_count = int(config.RISK_THRESHOLDS.get("max_cancel_count", 5) or 0)
+        self.max_repeat_count = int(config.RISK_THRESHOLDS.get(
             "max_repeat_count",
             config.RISK_THRESHOLDS.get("max_symbol_order_count", 0),
-        )
+        ) or 0)
         
-        self.order_signature_count = {}
-        self.cancel_signature_count = {}
+        # 签名 -> 出现次数
+        self.order_signature_count = Counter()
+        self.cancel_signature_count = Counter()
+        self._reset_last_signatures()
         
+        # 价格 Tick 检查缓存（合约对象 -> 1 / pricetick）
+        self._tick_contract = None
+        self._inv_price_tick = 0.0
+
+        # 撤单计数变化通知（供用例等待异步撤单回报）
+        self._cancel_cond = threading.Condition()
+
         # 会话订单追踪
-        self.session_order_ids = set()
+        self.session_order_ids = {}  # 按登记顺序保存（值恒为 None），最多 MAX_SESSION_ORDERS 个
         
         # 上一次日志状态（用于去重）
         self.last_log_order_count = -1
         self.last_log_cancel_count = -1
+        self._reset_warnings()
+
+    def _reset_counts(self) -> None:
+        """计数器清零。"""
+        self.order_count = 0
+        self.cancel_count = 0
+        self.repeat_order_count = 0
+        self.repeat_cancel_count = 0
+        self.rejection_count = 0
+
+    def _reset_warnings(self) -> None:
+        """
+        清除预警标记并重新打开阈值闸门。
+        闸门仅在阈值有效且尚未预警时为 True，热路径上只需判断一个布尔值；
+        预警一次后闸门关闭，直到阈值更新或计数器重置。
+        """
         self._warned_order_threshold = False
         self._warned_cancel_threshold = False
         self._warned_repeat_threshold = False
+        self._order_gate_open = self.max_order_count > 0
+        self._cancel_gate_open = self.max_cancel_count > 0
+        self._repeat_gate_open = self.max_repeat_count > 0
+
+    def _reset_last_signatures(self) -> None:
+        """
+        最近一次签名的单条缓存。
+        重复报单/撤单测试会连续提交相同签名，命中时只做整数自增；
+        未命中时才把旧签名的计数写回 Counter 并换入新签名。
+        """
+        self._last_order_sig = None
+        self._last_order_sig_count = 0
+        self._last_cancel_sig = None
+        self._last_cancel_sig_count = 0
 
     def register_order(self, vt_orderid: str):
         """注册当前会话追踪的订单 ID"""
-        self.session_order_ids.add(vt_orderid)
+        ids = self.session_order_ids
+        ids[vt_orderid] = None
+        if len(ids) > MAX_SESSION_ORDERS:
+            ids.pop(next(iter(ids)))
 
     def register_cancel_request(self, req: CancelRequest) -> None:
-        sig = (
-            str(getattr(req, "orderid", "") or ""),
-            str(getattr(req, "symbol", "") or ""),
-            str(getattr(req, "exchange", "") or ""),
-        )
-        current = int(self.cancel_signature_count.get(sig, 0)) + 1
-        self.cancel_signature_count[sig] = current
+        # 撤单签名拼成单个字符串（\x1f 为单元分隔符，不会出现在代码/编号中），只需一次哈希
+        try:
+            sig = f"{req.orderid or ''}\x1f{req.symbol or ''}\x1f{req.exchange or ''}"
+        except AttributeError:
+            sig = "\x1f".join((
+                str(getattr(req, "orderid", "") or ""),
+                str(getattr(req, "symbol", "") or ""),
+                str(getattr(req, "exchange", "") or ""),
+            ))
+        if sig == self._last_cancel_sig:
+            self._last_cancel_sig_count += 1
+        else:
+            counts = self.cancel_signature_count
+            if self._last_cancel_sig is not None:
+                counts[self._last_cancel_sig] = self._last_cancel_sig_count
+            self._last_cancel_sig = sig
+            self._last_cancel_sig_count = counts[sig] + 1
+        current = self._last_cancel_sig_count
         if current >= 2:
             self.repeat_cancel_count += 1
-            self._check_repeat_threshold()
+            if self._repeat_gate_open:
+                self._warn_repeat_threshold()
 
     def _order_signature(self, req: OrderRequest) -> tuple:
+        # 快速路径：标准 OrderRequest 字段齐全，直接读取属性。
+        # 方向/开平/类型直接放枚举成员（单例，比较走身份），省去 .value 的描述符调用
+        try:
+            symbol = req.symbol
+            return (
+                # 合约代码取值范围有限，驻留后签名键比较可走指针相等
+                sys.intern(symbol) if type(symbol) is str else (symbol or ""),
+                req.direction,
+                req.offset,
+                req.type,
+                float(req.volume or 0),
+                round(float(req.price or 0), 10),
+            )
+        except AttributeError:
+            pass
+
+        # 兼容路径：缺少字段的请求对象
         direction = getattr(req, "direction", None)
         offset = getattr(req, "offset", None)
         order_type = getattr(req, "type", None)
@@ -72,17 +162,24 @@ class TestRiskManager:
             round(float(getattr(req, "price", 0) or 0), 10),
         )
 
+    def _get_inv_price_tick(self, contract) -> float:
+        """返回合约最小变动价位的倒数（按合约对象缓存），pricetick 无效时返回 0。"""
+        if contract is not self._tick_contract:
+            tick = contract.pricetick
+            self._inv_price_tick = 1.0 / tick if tick > 0 else 0.0
+            self._tick_contract = contract
+        return self._inv_price_tick
+
     def _repeat_total(self) -> int:
-        return int(self.repeat_order_count) + int(self.repeat_cancel_count)
+        return self.repeat_order_count + self.repeat_cancel_count
 
-    def _check_repeat_threshold(self) -> None:
-        threshold = int(self.max_repeat_count or 0)
-        if threshold <= 0:
-            return
-        current = self._repeat_total()
-        if current >= threshold:
-            log_warning(f"【阈值预警】重复报单统计({current})达到或超过阈值({threshold})! 🚨")
+    def _warn_repeat_threshold(self) -> None:
+        """仅在重复报单闸门打开时调用。"""
+        current = self.repeat_order_count + self.repeat_cancel_count
+        if current >= self.max_repeat_count:
+            log_warning("【阈值预警】重复报单统计(%s)达到或超过阈值(%s)! 🚨", current, self.max_repeat_count)
             self._warned_repeat_threshold = True
+            self._repeat_gate_open = False
 
     def check_order(self, req: OrderRequest) -> bool:
         """
@@ -94,39 +191,47 @@ class TestRiskManager:
             return False
             
         # 2. 检查合约代码有效性（模拟）
-        if req.symbol == "INVALID_CODE" or req.symbol == "INVALID":
-            log_error(f"⚠️ 【交易指令检查】发现合约代码错误: {req.symbol}")
+        if req.symbol in _BAD_SYMBOLS:
+            log_error("⚠️ 【交易指令检查】发现合约代码错误: %s", req.symbol)
             return False
 
         # 2.5 检查委托数量
         if req.volume >= 10000 and req.reference != "FundTest":
-            log_error(f"⚠️ 【交易指令检查】发现数量错误: 不合法的数量")
+            log_error("⚠️ 【交易指令检查】发现数量错误: 不合法的数量")
             return False
         
-        # 3. 检查价格 Tick
-        if self.tester and self.tester.contract and req.symbol == self.tester.contract.symbol:
-            tick = self.tester.contract.pricetick
-            if tick > 0:
-                remainder = req.price % tick
-                # 浮点数容差
-                if not (abs(remainder) < 1e-6 or abs(remainder - tick) < 1e-6):
-                    log_error(f"⚠️ 【交易指令检查】委托价格({req.price})不符合最小变动价位({tick})")
+        # 3. 检查价格 Tick：换算成 tick 数后判断是否为整数（以 tick 为单位的容差）
+        contract = self.tester.contract if self.tester else None
+        if contract and req.symbol == contract.symbol:
+            inv_tick = self._get_inv_price_tick(contract)
+            if inv_tick:
+                # remainder(x, 1.0) 为 x 到最近整数的有符号距离
+                if fabs(remainder(req.price * inv_tick, 1.0)) > 1e-6:
+                    log_error("⚠️ 【交易指令检查】委托价格(%s)不符合最小变动价位(%s)", req.price, contract.pricetick)
                     return False
 
         # 4. 更新并检查计数器
         self.order_count += 1
 
         sig = self._order_signature(req)
-        current_sig = int(self.order_signature_count.get(sig, 0)) + 1
-        self.order_signature_count[sig] = current_sig
+        if sig == self._last_order_sig:
+            self._last_order_sig_count += 1
+        else:
+            counts = self.order_signature_count
+            if self._last_order_sig is not None:
+                counts[self._last_order_sig] = self._last_order_sig_count
+            self._last_order_sig = sig
+            self._last_order_sig_count = counts[sig] + 1
+        current_sig = self._last_order_sig_count
         if current_sig >= 2:
             self.repeat_order_count += 1
-            self._check_repeat_threshold()
+            if self._repeat_gate_open:
+                self._warn_repeat_threshold()
 
-        order_threshold = int(self.max_order_count or 0)
-        if order_threshold > 0 and self.order_count >= order_threshold:
-            log_warning(f"【阈值预警】报单总数({self.order_count})达到或超过阈值({order_threshold})! 🚨")
+        if self._order_gate_open and self.order_count >= self.max_order_count:
+            log_warning("【阈值预警】报单总数(%s)达到或超过阈值(%s)! 🚨", self.order_count, self.max_order_count)
             self._warned_order_threshold = True
+            self._order_gate_open = False
             
         return True
 
@@ -144,7 +249,7 @@ class TestRiskManager:
         订单提交时的回调（ACK）。
         """
         if self.order_count != self.last_log_order_count:
-            log_info(f"【监测】当前报单总数: {self.order_count}")
+            log_info("【监测】当前报单总数: %s", self.order_count)
             self.last_log_order_count = self.order_count
 
     def on_order_cancelled(self, order: OrderData) -> None:
@@ -156,15 +261,25 @@ class TestRiskManager:
             return
 
         self.cancel_count += 1
+        with self._cancel_cond:
+            self._cancel_cond.notify_all()
         
         if self.cancel_count != self.last_log_cancel_count:
-            log_info(f"【监测】当前撤单总数: {self.cancel_count}")
+            log_info("【监测】当前撤单总数: %s", self.cancel_count)
             self.last_log_cancel_count = self.cancel_count
 
-        cancel_threshold = int(self.max_cancel_count or 0)
-        if cancel_threshold > 0 and self.cancel_count >= cancel_threshold:
-            log_warning(f"【阈值预警】撤单总数({self.cancel_count})达到或超过阈值({cancel_threshold})! 🚨")
+        if self._cancel_gate_open and self.cancel_count >= self.max_cancel_count:
+            log_warning("【阈值预警】撤单总数(%s)达到或超过阈值(%s)! 🚨", self.cancel_count, self.max_cancel_count)
             self._warned_cancel_threshold = True
+            self._cancel_gate_open = False
+
+    def wait_for_cancel_count(self, expected: int, timeout: float) -> bool:
+        """
+        阻塞直到撤单总数达到 expected（撤单计数在回报线程中异步增加），或超时。
+        返回是否在超时前达到。
+        """
+        with self._cancel_cond:
+            return self._cancel_cond.wait_for(lambda: self.cancel_count >= expected, timeout)
 
     def on_order_rejected(self, order: OrderData) -> None:
         """
@@ -172,7 +287,7 @@ class TestRiskManager:
         """
         self.rejection_count += 1
         reject_code = getattr(order, 'reject_code', None)
-        log_info(f"【风控监测】收到CTP拒绝, 累计拒绝次数: {self.rejection_count}, 错误码: {reject_code}")
+        log_info("【风控监测】收到CTP拒绝, 累计拒绝次数: %s, 错误码: %s", self.rejection_count, reject_code)
             
     def emergency_stop(self):
         """
@@ -191,18 +306,17 @@ class TestRiskManager:
             self.max_cancel_count = int(max_cancel)
         if max_repeat is not None:
             self.max_repeat_count = int(max_repeat)
-        self._warned_order_threshold = False
-        self._warned_cancel_threshold = False
-        self._warned_repeat_threshold = False
+        self._reset_warnings()
         log_info(
-            f"风控阈值已更新: Order={self.max_order_count}, Cancel={self.max_cancel_count}, Repeat={self.max_repeat_count}"
+            "风控阈值已更新: Order=%s, Cancel=%s, Repeat=%s",
+            self.max_order_count, self.max_cancel_count, self.max_repeat_count,
         )
 
     def get_thresholds(self) -> dict:
         return {
-            "max_order_count": int(self.max_order_count or 0),
-            "max_cancel_count": int(self.max_cancel_count or 0),
-            "max_repeat_count": int(self.max_repeat_count or 0),
+            "max_order_count": self.max_order_count,
+            "max_cancel_count": self.max_cancel_count,
+            "max_repeat_count": self.max_repeat_count,
         }
 
     def get_metrics(self) -> dict:
@@ -215,20 +329,28 @@ class TestRiskManager:
             "rejection_count": int(self.rejection_count),
         }
 
-    def reset_counters(self):
+    def reset_repeat_counters(self):
         """
-        重置所有计数器。
+        仅重置重复报单/撤单统计（含签名记录与重复预警），不影响报单/撤单总数。
+        供重复报单阈值用例在本用例内重新越过阈值。
         """
-        self.order_count = 0
-        self.cancel_count = 0
         self.repeat_order_count = 0
         self.repeat_cancel_count = 0
-        self.rejection_count = 0
+        self.order_signature_count.clear()
+        self.cancel_signature_count.clear()
+        self._reset_last_signatures()
+        self._warned_repeat_threshold = False
+        self._repeat_gate_open = self.max_repeat_count > 0
+
+    def reset_counters(self):
+        """
+        重置所有计数器。
+        """
+        self._reset_counts()
         self.last_log_order_count = -1
         self.last_log_cancel_count = -1
         self.order_signature_count.clear()
         self.cancel_signature_count.clear()
-        self._warned_order_threshold = False
-        self._warned_cancel_threshold = False
-        self._warned_repeat_threshold = False
+        self._reset_last_signatures()
+        self._reset_warnings()
         log_info("风控计数器已重置")
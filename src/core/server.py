@@ -1,112 +1,199 @@
+import selectors
 import socket
 import threading
 import json
+from typing import Union
 from src.config import reader as config
 from src.logging import log_info, log_error
 
+# RPC 帧编解码：装有 orjson 时优先使用，否则退回标准库（紧凑分隔符）
+# OPT_NON_STR_KEYS 让 orjson 与标准库一样把非字符串字典键转成字符串
+try:
+    import orjson
+
+    def _dumps(obj) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+
+    _loads = orjson.loads
+except ImportError:
+    def _dumps(obj) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    _loads = json.loads
+
 class CommandServer(threading.Thread):
     """
     接收来自外部脚本 (scripts/control.py) 控制命令的 RPC 服务器。
     命令：DISCONNECT, RECONNECT, PAUSE
     """
     def __init__(self, context):
-        super().__init__()
+        super().__init__(daemon=True)  # 不阻止进程退出
         self.context = context  # 应提供方法：disconnect(), reconnect(), pause()
         self.host = config.RPC_HOST
         self.port = config.RPC_PORT
         self.running = True
         self.server_socket = None
+        # 分发表，首次处理命令时构建
+        self._cmd_table = None
+        self._req_table = None
+        # 唤醒用套接字对（Windows 下 select 只支持套接字，故不用 os.pipe）
+        self._wakeup_recv, self._wakeup_send = socket.socketpair()
 
     def run(self):
+        sel = selectors.DefaultSelector()
         try:
             self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            # 重启后可立即重新绑定（不等 TIME_WAIT）；Windows 下 SO_REUSEADDR 允许抢占端口，改用独占绑定
+            if hasattr(socket, "SO_EXCLUSIVEADDRUSE"):
+                self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_EXCLUSIVEADDRUSE, 1)
+            else:
+                self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
             self.server_socket.bind((self.host, self.port))
-            self.server_socket.listen(1)
-            log_info(f"Command Server listening on {self.host}:{self.port}")
+            self.server_socket.listen(64)
+            self.server_socket.setblocking(False)
+            sel.register(self.server_socket, selectors.EVENT_READ)
+            sel.register(self._wakeup_recv, selectors.EVENT_READ)
+            log_info("Command Server listening on %s:%s", self.host, self.port)
 
             while self.running:
-                try:
-                    self.server_socket.settimeout(1.0)
-                    client_socket, addr = self.server_socket.accept()
-                    with client_socket:
-                        client_socket.settimeout(0.5)
-                        raw = b""
-                        while True:
-                            try:
-                                chunk = client_socket.recv(4096)
-                                if not chunk:
-                                    break
-                                raw += chunk
-                                if b"\n" in raw or len(raw) > 65536:
-                                    break
-                            except socket.timeout:
-                                break
-
-                        data = raw.decode("utf-8", errors="replace").strip()
-                        if not data:
-                            continue
-
-                        if data.startswith("{"):
-                            try:
-                                req = json.loads(data)
-                                resp = self.process_request(req)
-                            except Exception as e:
-                                resp = {"ok": False, "error": f"invalid_request: {e}"}
-                            client_socket.sendall((json.dumps(resp, ensure_ascii=False) + "\n").encode("utf-8"))
-                        else:
-                            log_info(f"RPC Received command: {data}")
-                            self.process_command(data)
-                            client_socket.sendall(b"OK")
-                except socket.timeout:
-                    continue
-                except Exception as e:
-                    if self.running:
-                        log_error(f"RPC Server accept error: {e}")
+                # 空闲时阻塞在 select 上；stop() 通过唤醒套接字立即打断
+                for key, _ in sel.select(timeout=1.0):
+                    if key.fileobj is not self.server_socket:
+                        continue
+                    try:
+                        client_socket, addr = self.server_socket.accept()
+                        with client_socket:
+                            self._handle_client(client_socket)
+                    except BlockingIOError:
+                        continue
+                    except Exception as e:
+                        if self.running:
+                            log_error("RPC Server accept error: %s", e)
 
         except Exception as e:
-            log_error(f"RPC Server startup error: {e}")
+            log_error("RPC Server startup error: %s", e)
         finally:
+            sel.close()
             self.stop()
+            for sock in (self._wakeup_send, self._wakeup_recv):
+                sock.close()
+
+    def _handle_client(self, client_socket: socket.socket):
+        """
+        每个连接只处理一帧：读到第一个换行即应答，随后由调用方关闭连接。
+        旧式纯文本命令不带换行，以对端关闭写端或空闲超时作为帧结束。
+        """
+        client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        client_socket.settimeout(0.5)
+        raw = bytearray()  # 原地追加，避免 bytes 拼接的反复拷贝
+        while len(raw) <= 65536:
+            try:
+                chunk = client_socket.recv(4096)
+            except socket.timeout:
+                break
+            if not chunk:
+                break
+            # 只在新到的数据里找换行，避免每次重扫整个缓冲区
+            end = chunk.find(b"\n")
+            if end >= 0:
+                raw += chunk[:end]
+                break
+            raw += chunk
+        self._handle_frame(client_socket, raw)
+
+    def _handle_frame(self, client_socket: socket.socket, raw: Union[bytes, bytearray]):
+        data = raw.decode("utf-8", errors="replace").strip()
+        if not data:
+            return
+
+        if data.startswith("{"):
+            self._handle_json(client_socket, data)
+        else:
+            self._handle_legacy(client_socket, data)
+
+    def _handle_json(self, client_socket: socket.socket, data: str):
+        """JSON 请求：应答一行 JSON（以换行结尾）。"""
+        try:
+            req = _loads(data)
+            resp = self.process_request(req)
+        except Exception as e:
+            resp = {"ok": False, "error": f"invalid_request: {e}"}
+        try:
+            frame = _dumps(resp)
+        except Exception as e:
+            # 不可序列化的返回值（如任意对象）编码失败时，也要给客户端回一帧错误
+            log_error("RPC response encode error: %s", e)
+            request_id = resp.get("request_id") if isinstance(resp, dict) else None
+            frame = _dumps({"request_id": request_id, "ok": False, "error": f"encode_error: {e}"})
+        client_socket.sendall(frame + b"\n")
+
+    def _handle_legacy(self, client_socket: socket.socket, data: str):
+        """旧式纯文本命令（DISCONNECT/RECONNECT/PAUSE）：应答 OK。"""
+        log_info("RPC Received command: %s", data)
+        self.process_command(data)
+        client_socket.sendall(b"OK")
+
+    def _build_dispatch_tables(self):
+        """
+        构建命令/请求分发表（首次调用时构建，context 的方法可能在构造后才绑定）。
+        请求处理函数接收 payload，返回值非 None 时作为响应的 data 字段。
+        """
+        ctx = self.context
+        self._cmd_table = {
+            "DISCONNECT": ctx.disconnect,
+            "RECONNECT": ctx.reconnect,
+            "PAUSE": ctx.pause,
+        }
+        req_table = {"PING": lambda payload: {"pong": True}}
+        for cmd in self._cmd_table:
+            req_table[cmd] = lambda payload, cmd=cmd: self.process_command(cmd)
+        if hasattr(ctx, "get_status"):
+            req_table["GET_STATUS"] = lambda payload: ctx.get_status()
+        if hasattr(ctx, "reset_risk"):
+            req_table["RESET_RISK"] = lambda payload: ctx.reset_risk()
+        if hasattr(ctx, "run_case"):
+            req_table["RUN_CASE"] = lambda payload: {
+                "accepted": bool(ctx.run_case(str(payload.get("case_id", "")).strip()))
+            }
+        self._req_table = req_table
 
     def process_command(self, cmd: str):
+        if self._cmd_table is None:
+            self._build_dispatch_tables()
         cmd = cmd.upper()
-        if cmd == "DISCONNECT":
-            self.context.disconnect()
-        elif cmd == "RECONNECT":
-            self.context.reconnect()
-        elif cmd == "PAUSE":
-            self.context.pause()
+        handler = self._cmd_table.get(cmd)
+        if handler:
+            handler()
         else:
-            log_error(f"Unknown RPC command: {cmd}")
+            log_error("Unknown RPC command: %s", cmd)
 
     def process_request(self, req: dict) -> dict:
         if hasattr(self.context, "handle_rpc_request"):
             return self.context.handle_rpc_request(req)
 
+        if self._req_table is None:
+            self._build_dispatch_tables()
         request_id = req.get("request_id")
         req_type = str(req.get("type", "")).upper()
         payload = req.get("payload") or {}
 
-        try:
-            if req_type == "PING":
-                return {"request_id": request_id, "ok": True, "data": {"pong": True}}
-            if req_type in {"DISCONNECT", "RECONNECT", "PAUSE"}:
-                self.process_command(req_type)
-                return {"request_id": request_id, "ok": True}
-            if req_type == "GET_STATUS" and hasattr(self.context, "get_status"):
-                return {"request_id": request_id, "ok": True, "data": self.context.get_status()}
-            if req_type == "RESET_RISK" and hasattr(self.context, "reset_risk"):
-                self.context.reset_risk()
-                return {"request_id": request_id, "ok": True}
-            if req_type == "RUN_CASE" and hasattr(self.context, "run_case"):
-                accepted = self.context.run_case(str(payload.get("case_id", "")).strip())
-                return {"request_id": request_id, "ok": True, "data": {"accepted": bool(accepted)}}
+        handler = self._req_table.get(req_type)
+        if handler is None:
             return {"request_id": request_id, "ok": False, "error": f"unknown_type: {req_type}"}
+        try:
+            data = handler(payload)
         except Exception as e:
             return {"request_id": request_id, "ok": False, "error": str(e)}
+        if data is None:
+            return {"request_id": request_id, "ok": True}
+        return {"request_id": request_id, "ok": True, "data": data}
 
     def stop(self):
         self.running = False
+        try:
+            self._wakeup_send.send(b"\0")
+        except OSError:
+            pass
         if self.server_socket:
             try:
                 self.server_socket.close()
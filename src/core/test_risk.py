@@ -0,0 +1,162 @@
+"""Unit tests for src/core/risk.py"""
+
+from types import SimpleNamespace
+
+import src.path_setup  # noqa: F401
+
+import pytest
+from vnpy.trader.constant import Direction, Exchange, Offset, OrderType
+from vnpy.trader.object import OrderRequest
+
+from src.core import risk
+
+
+def _req(price: float = 4700.0, direction: Direction = Direction.LONG, symbol: str = "IF2602") -> OrderRequest:
+    return OrderRequest(
+        symbol=symbol,
+        exchange=Exchange.CFFEX,
+        direction=direction,
+        type=OrderType.LIMIT,
+        volume=1,
+        price=price,
+        offset=Offset.OPEN,
+    )
+
+
+def _warnings(caplog, keyword: str) -> int:
+    return sum(1 for r in caplog.records if keyword in r.getMessage())
+
+
+@pytest.fixture
+def rm():
+    manager = risk.TestRiskManager()
+    manager.set_thresholds(max_order=0, max_cancel=0, max_repeat=0)
+    return manager
+
+
+# ---------------------------------------------------------------------------
+# 重复报单签名统计
+# ---------------------------------------------------------------------------
+
+class TestRepeatSignatures:
+    def test_interleaved_signatures_keep_per_signature_counts(self, rm):
+        a, b, c = _req(4700.0), _req(4700.2), _req(4700.4)
+
+        for req in (a, a, b, a, b, b, c, a):
+            rm.check_order(req)
+
+        # a: 4 次（3 次重复），b: 3 次（2 次重复），c: 1 次
+        assert rm.repeat_order_count == 5
+        assert rm.order_count == 8
+
+    def test_direction_distinguishes_signatures(self, rm):
+        rm.check_order(_req(direction=Direction.LONG))
+        rm.check_order(_req(direction=Direction.SHORT))
+
+        assert rm.repeat_order_count == 0
+
+    def test_signature_keys_on_enum_members(self, rm):
+        sig = rm._order_signature(_req())
+
+        assert sig[1] is Direction.LONG
+        assert sig[2] is Offset.OPEN
+        assert sig[3] is OrderType.LIMIT
+
+    def test_reset_repeat_counters_keeps_totals(self, rm):
+        a = _req()
+        for _ in range(3):
+            rm.check_order(a)
+
+        rm.reset_repeat_counters()
+        rm.check_order(a)
+
+        assert rm.repeat_order_count == 0
+        assert rm.order_count == 4
+
+
+# ---------------------------------------------------------------------------
+# 阈值预警闸门
+# ---------------------------------------------------------------------------
+
+class TestThresholdGates:
+    def test_order_warning_fires_once_per_crossing(self, rm, caplog):
+        rm.set_thresholds(max_order=2)
+
+        for i in range(5):
+            rm.check_order(_req(4700.0 + i))
+
+        assert _warnings(caplog, "报单总数") == 1
+
+    def test_repeat_gate_rearmed_by_set_thresholds(self, rm, caplog):
+        rm.set_thresholds(max_repeat=2)
+        a = _req()
+        for _ in range(5):
+            rm.check_order(a)
+        assert _warnings(caplog, "重复报单统计") == 1
+
+        rm.set_thresholds(max_repeat=2)
+        rm.check_order(a)
+
+        assert _warnings(caplog, "重复报单统计") == 2
+
+    def test_repeat_gate_rearmed_by_reset_counters(self, rm, caplog):
+        rm.set_thresholds(max_repeat=1)
+        a = _req()
+        for _ in range(3):
+            rm.check_order(a)
+
+        rm.reset_counters()
+        rm.check_order(a)
+        assert _warnings(caplog, "重复报单统计") == 1
+
+        rm.check_order(a)
+        assert _warnings(caplog, "重复报单统计") == 2
+
+    def test_repeat_gate_rearmed_by_reset_repeat_counters(self, rm, caplog):
+        rm.set_thresholds(max_repeat=1)
+        a = _req()
+        for _ in range(3):
+            rm.check_order(a)
+
+        rm.reset_repeat_counters()
+        rm.check_order(a)
+        rm.check_order(a)
+
+        assert _warnings(caplog, "重复报单统计") == 2
+
+    def test_disabled_threshold_never_warns(self, rm, caplog):
+        a = _req()
+        for _ in range(5):
+            rm.check_order(a)
+
+        assert _warnings(caplog, "阈值预警") == 0
+
+
+# ---------------------------------------------------------------------------
+# 最小变动价位检查
+# ---------------------------------------------------------------------------
+
+class TestPriceTick:
+    def _with_tick(self, rm, pricetick: float) -> risk.TestRiskManager:
+        rm.tester = SimpleNamespace(contract=SimpleNamespace(symbol="IF2602", pricetick=pricetick))
+        return rm
+
+    @pytest.mark.parametrize("price", [4700.0, 4700.2, 4700.6, 4699.8])
+    def test_on_tick_accepted_for_fractional_tick(self, rm, price):
+        assert self._with_tick(rm, 0.2).check_order(_req(price)) is True
+
+    @pytest.mark.parametrize("price", [4700.1, 4700.04, 4700.3])
+    def test_off_tick_rejected_for_fractional_tick(self, rm, price):
+        assert self._with_tick(rm, 0.2).check_order(_req(price)) is False
+
+    @pytest.mark.parametrize("price", [4700.0, 4705.0])
+    def test_on_tick_accepted_for_whole_tick(self, rm, price):
+        assert self._with_tick(rm, 5).check_order(_req(price)) is True
+
+    @pytest.mark.parametrize("price", [4701.0, 4700.2])
+    def test_off_tick_rejected_for_whole_tick(self, rm, price):
+        # 4700.2 仅偏离 0.2 元，但换算成 tick 为 0.04 个，同样拒绝
+        assert self._with_tick(rm, 5).check_order(_req(price)) is False
+
+    def test_other_symbol_skips_tick_check(self, rm):
+        assert self._with_tick(rm, 0.2).check_order(_req(4700.1, symbol="IF2603")) is True
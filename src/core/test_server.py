@@ -0,0 +1,118 @@
+"""Unit tests for src/core/server.py"""
+
+import json
+import socket
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from src.core import server as server_mod
+
+
+@pytest.fixture
+def ctx():
+    calls = []
+    return SimpleNamespace(
+        calls=calls,
+        disconnect=lambda: calls.append("DISCONNECT"),
+        reconnect=lambda: calls.append("RECONNECT"),
+        pause=lambda: calls.append("PAUSE"),
+    )
+
+
+@pytest.fixture
+def server(ctx):
+    srv = server_mod.CommandServer(ctx)
+    yield srv
+    srv._wakeup_send.close()
+    srv._wakeup_recv.close()
+
+
+def _tcp_pair():
+    """本机 TCP 连接对（_handle_client 会设置 TCP_NODELAY，socketpair 不支持）。"""
+    with socket.create_server(("127.0.0.1", 0)) as listener:
+        client = socket.create_connection(listener.getsockname())
+        peer, _ = listener.accept()
+    return client, peer
+
+
+def _serve(server, *chunks: bytes, shutdown: bool = False) -> bytes:
+    """在本机连接上跑一次 _handle_client，按块发送请求，返回服务端关闭前写出的全部字节。"""
+    client, peer = _tcp_pair()
+    with client:
+        def feed():
+            for i, chunk in enumerate(chunks):
+                if i:
+                    time.sleep(0.05)  # 分多次到达，逼服务端多次 recv
+                client.sendall(chunk)
+            if shutdown:
+                client.shutdown(socket.SHUT_WR)
+
+        sender = threading.Thread(target=feed)
+        sender.start()
+        with peer:
+            server._handle_client(peer)
+        sender.join()
+
+        out = bytearray()
+        while True:
+            data = client.recv(4096)
+            if not data:
+                return bytes(out)
+            out += data
+
+
+class TestFraming:
+    def test_only_first_of_two_frames_in_one_chunk_is_answered(self, server):
+        out = _serve(server, b'{"type":"PING","request_id":1}\n{"type":"PING","request_id":2}\n')
+
+        lines = out.splitlines()
+        assert len(lines) == 1
+        assert json.loads(lines[0]) == {"request_id": 1, "ok": True, "data": {"pong": True}}
+
+    def test_frame_split_across_chunks(self, server):
+        out = _serve(server, b'{"type":"PI', b'NG","request_id":"abc"}', b"\n")
+
+        assert out.endswith(b"\n")
+        assert json.loads(out) == {"request_id": "abc", "ok": True, "data": {"pong": True}}
+
+    def test_legacy_command_without_newline(self, server, ctx):
+        out = _serve(server, b"pause", shutdown=True)
+
+        assert out == b"OK"
+        assert ctx.calls == ["PAUSE"]
+
+    def test_legacy_command_ends_on_idle_timeout(self, server, ctx):
+        out = _serve(server, b"DISCONNECT")
+
+        assert out == b"OK"
+        assert ctx.calls == ["DISCONNECT"]
+
+
+class TestJsonResponses:
+    def test_invalid_json_reports_error(self, server):
+        out = _serve(server, b"{not json\n")
+
+        resp = json.loads(out)
+        assert resp["ok"] is False
+        assert resp["error"].startswith("invalid_request:")
+
+    def test_non_str_keys_encode(self, server, ctx):
+        ctx.get_status = lambda: {1: "x"}
+
+        resp = json.loads(_serve(server, b'{"type":"GET_STATUS","request_id":7}\n'))
+
+        assert resp == {"request_id": 7, "ok": True, "data": {"1": "x"}}
+
+    def test_unencodable_response_still_answers_one_frame(self, server, ctx):
+        ctx.get_status = lambda: {"value": object()}
+
+        out = _serve(server, b'{"type":"GET_STATUS","request_id":7}\n')
+
+        assert out.count(b"\n") == 1
+        resp = json.loads(out)
+        assert resp["request_id"] == 7
+        assert resp["ok"] is False
+        assert resp["error"].startswith("encode_error:")
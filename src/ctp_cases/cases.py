@@ -1,7 +1,8 @@
 import time
 import traceback
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from src.config import reader as config
-from src.core.engine import TestEngine
+from src.core.engine import TestEngine, ACK_STATES
 from src.ctp_cases.helpers import wait_for_reaction, clean_environment
 from src.logging import log_info, log_error, log_warning
 from vnpy.trader.object import OrderRequest, CancelRequest
@@ -20,7 +21,11 @@ def test_2_1_1_connectivity(engine: TestEngine):
     # 检查连接
     if not engine.main_engine.get_gateway(engine.gateway_name):
         log_info("正在建立连接...")
-        engine.connect()
+        # 与 RPC 的断线/重连共用控制线程串行执行，避免并发重建网关
+        try:
+            engine.async_connect().result(timeout=10)
+        except FutureTimeoutError:
+            log_warning("连接请求 10 秒内未完成，继续观察回调日志")
     else:
         log_info("网关已连接，正在检查登录状态...")
     
@@ -59,18 +64,9 @@ def test_2_1_2_1_open(engine: TestEngine):
 
     # 1. 开仓 (2.1.2.1)
     log_info("--- 测试点 2.1.2.1: 开仓 ---")
-    req_open = OrderRequest(
-        symbol=engine.contract.symbol,
-        exchange=engine.contract.exchange,
-        direction=Direction.LONG,
-        type=OrderType.LIMIT,
-        volume=1,
-        price=config.DEAL_BUY_PRICE,
-        offset=Offset.OPEN,
-        reference="TestOpen"
-    )
-    engine.send_order(req_open)
-    wait_for_reaction(10, "等待开仓成交")
+    req_open = _contract_order(engine, price=config.DEAL_BUY_PRICE, reference="TestOpen")
+    vt_orderid = engine.send_order(req_open)
+    _wait_order(engine, vt_orderid, "开仓成交")
 
 def test_2_1_2_2_close(engine: TestEngine):
     """
@@ -83,18 +79,15 @@ def test_2_1_2_2_close(engine: TestEngine):
 
     # 2. 平仓 (2.1.2.2)
     log_info("--- 测试点 2.1.2.2: 平仓 ---")
-    req_close = OrderRequest(
-        symbol=engine.contract.symbol,
-        exchange=engine.contract.exchange,
+    req_close = _contract_order(
+        engine,
         direction=Direction.SHORT,
-        type=OrderType.LIMIT,
-        volume=1,
-        price=config.SAFE_BUY_PRICE, # 确保成交
+        price=config.SAFE_BUY_PRICE,  # 确保成交
         offset=Offset.CLOSE,
-        reference="TestClose"
+        reference="TestClose",
     )
-    engine.send_order(req_close)
-    wait_for_reaction(10, "等待平仓成交")
+    vt_orderid = engine.send_order(req_close)
+    _wait_order(engine, vt_orderid, "平仓成交")
 
 def test_2_1_2_3_cancel(engine: TestEngine):
     """
@@ -107,18 +100,13 @@ def test_2_1_2_3_cancel(engine: TestEngine):
 
     # 3. 撤单 (2.1.2.3)
     log_info("--- 测试点 2.1.2.3: 撤单 ---")
-    req_cancel_test = OrderRequest(
-        symbol=engine.contract.symbol,
-        exchange=engine.contract.exchange,
-        direction=Direction.LONG,
-        type=OrderType.LIMIT,
-        volume=1,
-        price=config.SAFE_BUY_PRICE, # 远离市价
-        offset=Offset.OPEN,
-        reference="TestCancel"
+    req_cancel_test = _contract_order(
+        engine,
+        price=config.SAFE_BUY_PRICE,  # 远离市价
+        reference="TestCancel",
     )
     vt_orderid = engine.send_order(req_cancel_test)
-    wait_for_reaction(10, "等待挂单确认")
+    _wait_order(engine, vt_orderid, "挂单确认", ACK_STATES)
     
     if vt_orderid:
         orderid = vt_orderid.split(".")[-1]
@@ -128,16 +116,40 @@ def test_2_1_2_3_cancel(engine: TestEngine):
             exchange=engine.contract.exchange
         )
         engine.cancel_order(req_c)
-        wait_for_reaction(10, "等待撤单回报")
+        _wait_order(engine, vt_orderid, "撤单回报")
+
+def _wait_order(engine: TestEngine, vt_orderid: str, what: str, statuses=None, timeout: float = 10) -> bool:
+    """等待订单回报（默认终态），超时或未发出订单时记录警告，不让缺失的回报静默通过。"""
+    if statuses is None:
+        ok = engine.wait_for_order(vt_orderid, timeout)
+    else:
+        ok = engine.wait_for_order(vt_orderid, timeout, statuses)
+    if not ok:
+        log_warning("未等到%s: 订单=%s (%s 秒内无对应回报)", what, vt_orderid or "未发出", timeout)
+    return ok
+
+def _contract_order(engine: TestEngine, **overrides) -> OrderRequest:
+    """
+    以测试合约构造委托请求。
+    默认：买入开仓、限价、1 手、SAFE_BUY_PRICE（调用时读取，运行期可被修改）；其余字段通过关键字覆盖。
+    网关只读取请求字段并另建 OrderData，不持有请求对象，批量发送时可反复提交同一实例。
+    """
+    contract = engine.contract
+    fields = {
+        "direction": Direction.LONG,
+        "type": OrderType.LIMIT,
+        "volume": 1,
+        "price": config.SAFE_BUY_PRICE,
+        "offset": Offset.OPEN,
+    }
+    fields.update(overrides)
+    return OrderRequest(symbol=contract.symbol, exchange=contract.exchange, **fields)
 
 def _check_contract(engine: TestEngine) -> bool:
     # 增加等待逻辑，防止合约信息尚未就绪
     if not engine.contract:
-        for _ in range(10):
-            log_info("等待合约信息同步...")
-            wait_for_reaction(1)
-            if engine.contract:
-                break
+        log_info("等待合约信息同步...")
+        engine.wait_for_contract(10)
 
     if not engine.contract:
         log_error(f"未获取到合约信息 ({config.TEST_SYMBOL})，跳过测试")
@@ -196,33 +208,15 @@ def test_2_2_3_1_repeat_open(engine: TestEngine):
     deal_vt_orderids = []
     safe_vt_orderid = ""
 
+    deal_template = _contract_order(engine, price=config.DEAL_BUY_PRICE, reference="RepeatOpen")
     for _ in range(deal_count):
-        req = OrderRequest(
-            symbol=engine.contract.symbol,
-            exchange=engine.contract.exchange,
-            direction=Direction.LONG,
-            type=OrderType.LIMIT,
-            volume=1,
-            price=config.DEAL_BUY_PRICE,
-            offset=Offset.OPEN,
-            reference="RepeatOpen",
-        )
-        vt_id = engine.send_order(req)
+        vt_id = engine.send_order(deal_template)
         if vt_id:
             deal_vt_orderids.append(vt_id)
 
+    safe_template = _contract_order(engine, reference="RepeatOpen")
     for _ in range(safe_count):
-        req = OrderRequest(
-            symbol=engine.contract.symbol,
-            exchange=engine.contract.exchange,
-            direction=Direction.LONG,
-            type=OrderType.LIMIT,
-            volume=1,
-            price=config.SAFE_BUY_PRICE,
-            offset=Offset.OPEN,
-            reference="RepeatOpen",
-        )
-        vt_id = engine.send_order(req)
+        vt_id = engine.send_order(safe_template)
         if vt_id and not safe_vt_orderid:
             safe_vt_orderid = vt_id
 
@@ -248,18 +242,14 @@ def test_2_2_3_2_repeat_close(engine: TestEngine):
     deal_open_vt_orderids = list(info.get("deal_open_vt_orderids") or [])
     close_count = min(max(1, repeat_close_threshold), len(deal_open_vt_orderids) or max(1, repeat_close_threshold))
 
+    template = _contract_order(
+        engine,
+        direction=Direction.SHORT,
+        offset=Offset.CLOSE,
+        reference="RepeatClose",
+    )
     for _ in range(close_count):
-        req = OrderRequest(
-            symbol=engine.contract.symbol,
-            exchange=engine.contract.exchange,
-            direction=Direction.SHORT,
-            type=OrderType.LIMIT,
-            volume=1,
-            price=config.SAFE_BUY_PRICE,
-            offset=Offset.CLOSE,
-            reference="RepeatClose",
-        )
-        engine.send_order(req)
+        engine.send_order(template)
     wait_for_reaction(2, "等待重复平仓反馈")
 
 def test_2_2_3_3_repeat_cancel(engine: TestEngine):
@@ -291,15 +281,7 @@ def test_2_2_3_3_repeat_cancel(engine: TestEngine):
         wait_for_reaction(2, "等待撤单反馈")
         return
 
-    req_base = OrderRequest(
-        symbol=engine.contract.symbol,
-        exchange=engine.contract.exchange,
-        direction=Direction.LONG,
-        type=OrderType.LIMIT,
-        volume=1,
-        price=config.SAFE_BUY_PRICE,
-        offset=Offset.OPEN,
-    )
+    req_base = _contract_order(engine)
     vt_orderid = engine.send_order(req_base)
     wait_for_reaction(1)
 
@@ -317,6 +299,24 @@ def test_2_2_3_3_repeat_cancel(engine: TestEngine):
 # 2.3 阈值管理
 # =============================================================================
 
+def _read_thresholds(rm) -> dict:
+    """
+    读取一次当前风控阈值（均为 int），用例开始时取快照，之后只用快照中的值。
+    不跨用例缓存：阈值可能在用例之间通过 Web 端修改。
+    """
+    try:
+        thresholds = rm.get_thresholds()
+    except Exception:
+        thresholds = {}
+    return {
+        key: int(thresholds.get(key, getattr(rm, key, 0)) or 0)
+        for key in ("max_order_count", "max_cancel_count", "max_repeat_count")
+    }
+
+def _plan_burst(threshold: int, cap: int = 10) -> int:
+    """阈值用例的发送笔数：threshold+1 笔以越过阈值，但不超过 cap。"""
+    return min(cap, threshold + 1)
+
 def test_2_3_1_1_order_threshold(engine: TestEngine):
     """
     2.3.1.1 报单笔数阈值测试（含统计验证）
@@ -328,13 +328,7 @@ def test_2_3_1_1_order_threshold(engine: TestEngine):
     log_info("\n>>> [2.3.1.1] 报单阈值与统计测试")
     
     rm = engine.risk_manager
-    thresholds = {}
-    try:
-        thresholds = rm.get_thresholds()
-    except Exception:
-        thresholds = {}
-
-    max_order_count = int(thresholds.get("max_order_count", getattr(rm, "max_order_count", 0)) or 0)
+    max_order_count = _read_thresholds(rm)["max_order_count"]
     log_info(f"当前报单阈值: {max_order_count}")
     
     # 记录初始计数
@@ -348,25 +342,17 @@ def test_2_3_1_1_order_threshold(engine: TestEngine):
         log_error("未获取到合约信息，跳过阈值触发测试")
         return
 
-    max_actions = 10
     sent_vt_orderids = []
 
     if max_order_count > 0:
-        send_n = min(max_actions, max_order_count + 1)
+        send_n = _plan_burst(max_order_count)
         log_info(f"--- 发送 {send_n} 笔委托验证统计与阈值 (阈值={max_order_count}) ---")
         
         warned = False
+        template = _contract_order(engine)
+        send_order = engine.send_order
         for i in range(send_n):
-            req = OrderRequest(
-                symbol=engine.contract.symbol,
-                exchange=engine.contract.exchange,
-                direction=Direction.LONG,
-                type=OrderType.LIMIT,
-                volume=1,
-                price=config.SAFE_BUY_PRICE,
-                offset=Offset.OPEN,
-            )
-            vt_id = engine.send_order(req)
+            vt_id = send_order(template)
             if vt_id:
                 sent_vt_orderids.append(vt_id)
             
@@ -374,11 +360,11 @@ def test_2_3_1_1_order_threshold(engine: TestEngine):
             expected_count = i + 1
             actual_count = rm.order_count
             if actual_count != expected_count:
-                log_warning(f"计数异常: 期望={expected_count}, 实际={actual_count}")
+                log_warning("计数异常: 期望=%s, 实际=%s", expected_count, actual_count)
             
             # 检查阈值预警
             if not warned and actual_count >= max_order_count:
-                log_warning(f"【阈值预警】报单笔数({actual_count})达到或超过阈值({max_order_count})! 🚨")
+                log_warning("【阈值预警】报单笔数(%s)达到或超过阈值(%s)! 🚨", actual_count, max_order_count)
                 warned = True
         
         wait_for_reaction(2, "检查报单统计与阈值预警")
@@ -413,71 +399,55 @@ def test_2_3_1_3_cancel_threshold(engine: TestEngine):
     log_info("\n>>> [2.3.1.3] 撤单阈值与统计测试")
     
     rm = engine.risk_manager
-    thresholds = {}
-    try:
-        thresholds = rm.get_thresholds()
-    except Exception:
-        thresholds = {}
-
-    max_cancel_count = int(thresholds.get("max_cancel_count", getattr(rm, "max_cancel_count", 0)) or 0)
+    max_cancel_count = _read_thresholds(rm)["max_cancel_count"]
     log_info(f"当前撤单阈值: {max_cancel_count}")
     
     # 记录初始计数
     initial_count = rm.cancel_count
     log_info(f"初始撤单总数: {initial_count}")
     
-    max_actions = 10
     sent_vt_orderids = getattr(engine, "last_sent_orders", [])
     
     # 如果没有之前的单子，先发一些
     if not sent_vt_orderids:
         log_info("无可用订单，先发送一批订单用于撤单测试...")
         if not engine.contract: return
+        template = _contract_order(engine)
         for _ in range(max(5, max_cancel_count + 2)):
-            req = OrderRequest(
-                symbol=engine.contract.symbol,
-                exchange=engine.contract.exchange,
-                direction=Direction.LONG,
-                type=OrderType.LIMIT,
-                volume=1,
-                price=config.SAFE_BUY_PRICE,
-                offset=Offset.OPEN,
-            )
-            vt_id = engine.send_order(req)
+            vt_id = engine.send_order(template)
             if vt_id: sent_vt_orderids.append(vt_id)
         wait_for_reaction(2)
 
     if max_cancel_count > 0:
         all_active = engine.get_all_active_orders()
         # 优先撤销之前发的
-        target_orders = [o for o in all_active if o.vt_orderid in sent_vt_orderids]
+        sent_set = set(sent_vt_orderids)
+        target_orders = [o for o in all_active if o.vt_orderid in sent_set]
         # 如果不够，撤销所有的
         if len(target_orders) < max_cancel_count + 1:
             target_orders = all_active
         
-        need_cancel = min(max_actions, max_cancel_count + 1)
+        need_cancel = _plan_burst(max_cancel_count)
         log_info(f"--- 撤销 {need_cancel} 笔委托验证统计与阈值 (阈值={max_cancel_count}, 可撤={len(target_orders)}) ---")
         
-        warned = False
         cancel_start_count = rm.cancel_count
         count = 0
-        for o in target_orders:
-            engine.cancel_order(o.create_cancel_request())
+        cancel_order = engine.cancel_order
+        for o in target_orders[:need_cancel]:
+            cancel_order(o.create_cancel_request())
             count += 1
-            
-            # 检查阈值预警
-            if not warned and rm.cancel_count >= max_cancel_count:
-                log_warning(f"【阈值预警】撤单笔数({rm.cancel_count})达到或超过阈值({max_cancel_count})! 🚨")
-                warned = True
-            
-            if count >= need_cancel:
-                break
         
-        wait_for_reaction(2, "检查撤单统计与阈值预警")
+        # 等待撤单回报把计数推到期望值（最多 2 秒），不再固定等待
+        expected_final = cancel_start_count + count
+        rm.wait_for_cancel_count(expected_final, 2)
         
-        # 最终验证
+        # 撤单计数在撤单回报中累加，预警以回报后观察到的计数为准
         final_count = rm.cancel_count
-        expected_final = cancel_start_count + count
+        warned = final_count >= max_cancel_count
+        if warned:
+            log_warning("【阈值预警】撤单笔数(%s)达到或超过阈值(%s)! 🚨", final_count, max_cancel_count)
+        
+        # 最终验证
         log_info(f"最终撤单总数: {final_count} (期望: {expected_final})")
         
         if final_count != expected_final:
@@ -500,34 +470,21 @@ def test_2_3_1_5_repeat_threshold(engine: TestEngine):
     log_info("\n>>> [2.3.1.5] 重复报单阈值测试")
     
     rm = engine.risk_manager
-    thresholds = {}
-    try:
-        thresholds = rm.get_thresholds()
-    except Exception:
-        thresholds = {}
-
-    max_repeat_count = int(thresholds.get("max_repeat_count", getattr(rm, "max_repeat_count", 0)) or 0)
+    max_repeat_count = _read_thresholds(rm)["max_repeat_count"]
     log_info(f"当前重复报单阈值: {max_repeat_count}")
 
     if not engine.contract: return
-    max_actions = 10
 
     # 2.3.1.5 / 2.3.1.6（选测）
     if max_repeat_count > 0:
-        repeat_send_n = min(max_actions, max_repeat_count + 1)
+        repeat_send_n = _plan_burst(max_repeat_count)
         log_info(f"--- 触发重复报单预警(选测) (阈值={max_repeat_count}, 本次重复发单={repeat_send_n}) ---")
+        # 之前的重复开仓/平仓用例已累计重复计数，清零后让阈值在本用例内被越过并预警
+        rm.reset_repeat_counters()
+        template = _contract_order(engine, reference="RepeatThresholdTest")
+        send_order = engine.send_order
         for _ in range(repeat_send_n):
-            req = OrderRequest(
-                symbol=engine.contract.symbol,
-                exchange=engine.contract.exchange,
-                direction=Direction.LONG,
-                type=OrderType.LIMIT,
-                volume=1,
-                price=config.SAFE_BUY_PRICE,
-                offset=Offset.OPEN,
-                reference="RepeatThresholdTest",
-            )
-            engine.send_order(req)
+            send_order(template)
         wait_for_reaction(2, "检查是否出现重复报单阈值预警")
     else:
         log_info("重复报单预警未启用(<=0)，跳过 2.3.1.5/2.3.1.6")
@@ -561,14 +518,9 @@ def test_2_4_1_2_price_error(engine: TestEngine):
     # 2. 价格错误
     log_info("--- 测试点 2.4.1.2: 最小变动价位错误 ---")
     if engine.contract:
-        req_err_tick = OrderRequest(
-            symbol=engine.contract.symbol,
-            exchange=engine.contract.exchange,
-            direction=Direction.LONG,
-            type=OrderType.LIMIT,
-            volume=1,
-            price=config.SAFE_BUY_PRICE + 0.0001, # 假设 tick > 0.0001
-            offset=Offset.OPEN
+        req_err_tick = _contract_order(
+            engine,
+            price=config.SAFE_BUY_PRICE + 0.0001,  # 假设 tick > 0.0001
         )
         engine.send_order(req_err_tick)
         wait_for_reaction(5, "等待 5 秒，查看是否出现错误日志")
@@ -612,15 +564,10 @@ def test_2_4_2_1_fund_error(engine: TestEngine):
 
     # 1. 资金不足
     log_info("--- 测试点 2.4.2.1: 资金不足回报 ---")
-    req_fund = OrderRequest(
-        symbol=engine.contract.symbol,
-        exchange=engine.contract.exchange,
-        direction=Direction.LONG,
-        type=OrderType.LIMIT,
-        volume=50000, # 足够大
-        price=config.SAFE_BUY_PRICE,
-        offset=Offset.OPEN,
-        reference="FundTest"
+    req_fund = _contract_order(
+        engine,
+        volume=50000,  # 足够大
+        reference="FundTest",
     )
     engine.send_order(req_fund)
     wait_for_reaction(5, "等待 5 秒，查看是否出现错误日志")
@@ -634,20 +581,15 @@ def test_2_4_2_2_pos_error(engine: TestEngine):
 
     # 2. 持仓不足
     log_info("--- 测试点 2.4.2.2: 持仓不足回报 ---")
-    req_pos = OrderRequest(
-        symbol=engine.contract.symbol,
-        exchange=engine.contract.exchange,
+    req_pos = _contract_order(
+        engine,
         direction=Direction.SHORT,
-        type=OrderType.LIMIT,
-        volume=1,
-        price=config.SAFE_BUY_PRICE,
-        offset=Offset.CLOSE, # 平仓
-        reference="CloseEmpty"
+        offset=Offset.CLOSE,  # 平仓
+        reference="CloseEmpty",
     )
     engine.send_order(req_pos)
     
-    wait_for_reaction(3, "等待 CTP 错误回报")
-    wait_for_reaction(5, "等待 5 秒，查看是否出现错误日志")
+    wait_for_reaction(5, "等待 CTP 错误回报，查看是否出现错误日志")
 
 def test_2_4_2_3_market_error(engine: TestEngine):
     """
@@ -690,15 +632,7 @@ def test_2_5_1_1_limit_perms(engine: TestEngine):
         log_error("未获取到合约，跳过测试")
         return
 
-    req = OrderRequest(
-        symbol=engine.contract.symbol,
-        exchange=engine.contract.exchange,
-        direction=Direction.LONG,
-        type=OrderType.LIMIT,
-        volume=1,
-        price=config.SAFE_BUY_PRICE,
-        offset=Offset.OPEN
-    )
+    req = _contract_order(engine)
 
     # ==========================================
     # 2.5.1.1 限制账号交易权限
@@ -725,15 +659,7 @@ def test_2_5_1_2_pause_strategy(engine: TestEngine):
         log_error("未获取到合约，跳过测试")
         return
     
-    req = OrderRequest(
-        symbol=engine.contract.symbol,
-        exchange=engine.contract.exchange,
-        direction=Direction.LONG,
-        type=OrderType.LIMIT,
-        volume=1,
-        price=config.SAFE_BUY_PRICE,
-        offset=Offset.OPEN
-    )
+    req = _contract_order(engine)
 
     # ==========================================
     # 2.5.1.2 暂停策略执行
@@ -762,16 +688,7 @@ def test_2_5_2_1_cancel_part(engine: TestEngine):
     
     # 发送挂单
     if engine.contract:
-        req = OrderRequest(
-            symbol=engine.contract.symbol,
-            exchange=engine.contract.exchange,
-            direction=Direction.LONG,
-            type=OrderType.LIMIT,
-            volume=1,
-            price=config.SAFE_BUY_PRICE,
-            offset=Offset.OPEN,
-            reference=f"PartCancel"
-        )
+        req = _contract_order(engine, reference="PartCancel")
         vt_id = engine.send_order(req)
         wait_for_reaction(2, "等待挂单生效")
         
@@ -793,19 +710,12 @@ def test_2_5_2_2_cancel_all(engine: TestEngine):
     engine.risk_manager.active = True
     
     # 发送几笔挂单
-    for i in range(3):
-        if engine.contract:
-            req = OrderRequest(
-                symbol=engine.contract.symbol,
-                exchange=engine.contract.exchange,
-                direction=Direction.LONG,
-                type=OrderType.LIMIT,
-                volume=1,
-                price=config.SAFE_BUY_PRICE,
-                offset=Offset.OPEN,
-                reference=f"Batch{i}"
-            )
-            engine.send_order(req)
+    if engine.contract:
+        template = _contract_order(engine)
+        send_order = engine.send_order
+        for i in range(3):
+            template.reference = f"Batch{i}"
+            send_order(template)
     
     wait_for_reaction(2, "等待挂单生效")
     
@@ -814,10 +724,18 @@ def test_2_5_2_2_cancel_all(engine: TestEngine):
     active_orders = engine.get_all_active_orders()
     log_info(f"检测到 {len(active_orders)} 笔活动订单，开始撤销...")
     
+    # 撤单请求是异步的（ReqOrderAction 不等回报），逐笔连发即可；网关 reqid 自增非线程安全，不并发提交
+    cancel_order = engine.cancel_order
     for order in active_orders:
-        engine.cancel_order(order.create_cancel_request())
-        
-    wait_for_reaction(3, "等待所有撤单完成")
+        cancel_order(order.create_cancel_request())
+    
+    # 所有撤单已在途，共用一个 3 秒期限等待回报，全部终结即提前返回
+    deadline = time.monotonic() + 3
+    done = sum(
+        engine.wait_for_order(order.vt_orderid, max(0.0, deadline - time.monotonic()))
+        for order in active_orders
+    )
+    log_info(f"撤单完成 {done}/{len(active_orders)} 笔")
 
 # =============================================================================
 # 2.6 日志记录
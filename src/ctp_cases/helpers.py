@@ -23,7 +23,7 @@ def clean_environment(engine):
     # 1. 撤销所有挂单
     active_orders = engine.get_all_active_orders()
     if active_orders:
-        log_info(f"发现 {len(active_orders)} 个挂单，正在撤销...")
+        log_info("发现 %s 个挂单，正在撤销...", len(active_orders))
         for order in active_orders:
             req = CancelRequest(
                 orderid=order.orderid,
@@ -43,7 +43,7 @@ def clean_environment(engine):
     for pos in positions:
         if pos.volume > 0:
             has_position = True
-            log_info(f"发现持仓: {pos.vt_symbol} {pos.direction.value} {pos.volume}手，正在平仓...")
+            log_info("发现持仓: %s %s %s手，正在平仓...", pos.vt_symbol, pos.direction.value, pos.volume)
             
             # 简单策略：多头用跌停价卖平，空头用涨停价买平 (这里简化处理，使用 DEAL_BUY_PRICE 微调)
             # 为了确保成交，多头平仓价格要极低，空头平仓价格要极高
@@ -1,6 +1,14 @@
+import functools
 import logging
+import re
 
+# 关键字各编译为一个交替正则，每类只需对消息扫描一次
+_CALLBACK_RE = re.compile("OnRtn|OnRsp|收到|回调")
+_SUCCESS_RE = re.compile("【|Success|成功|✓")
 
+
+# 阈值/统计类提示会反复输出同一行，缓存 (levelno, msg) 的结果避免重复扫描
+@functools.lru_cache(maxsize=4096)
 def color_for_log(levelno: int, msg: str) -> str:
     """统一的日志颜色分配函数。合并自 worker._color_for 和 socket_handler 内联逻辑。
     
@@ -15,8 +23,8 @@ def color_for_log(levelno: int, msg: str) -> str:
         return "#f85149"  # danger-color
     if levelno >= logging.WARNING:
         return "#d29922"  # warning-color
-    if "OnRtn" in msg or "OnRsp" in msg or "收到" in msg or "回调" in msg:
+    if _CALLBACK_RE.search(msg):
         return "#58a6ff"  # accent-color
-    if "【" in msg or "Success" in msg or "成功" in msg or "✓" in msg:
+    if _SUCCESS_RE.search(msg):
         return "#3fb950"  # success-color
     return "#8b949e"  # text-secondary
@@ -1,32 +1,98 @@
 import logging
+import re
+from collections import deque
 
 from flask_socketio import SocketIO
 
 from src.logging.color import color_for_log
+from src.logging.setup import FRAMEWORK_LOGGERS
+
+# 框架 logger 已在 setup_logger 中限制为 WARNING 及以上；这里的名字/正则判断只是兜底
+# （未调用 setup_logger 的进程，或框架放行的告警级记录）
+_NOISE_RE = re.compile(r"(?:GET|POST) /|HTTP/1\.1|socket\.io")
 
 
 def _is_flask_noise(msg: str) -> bool:
     """过滤 Werkzeug/Flask 访问日志和 socket.io 轮询噪音。"""
-    return "GET /" in msg or "POST /" in msg or "HTTP/1.1" in msg or "socket.io" in msg
+    return _NOISE_RE.search(msg) is not None
+
+
+def _not_framework_record(record: logging.LogRecord) -> bool:
+    """处理器过滤器：按 logger 名丢弃框架记录，在 Handler.handle 加锁与 emit 之前生效。"""
+    return not record.name.startswith(FRAMEWORK_LOGGERS)
 
 
 class SocketIOHandler(logging.Handler):
-    """直接推送到 SocketIO（Web 进程使用）。"""
+    """
+    推送到 SocketIO（Web 进程使用）。
+    记录先进入缓冲区，由后台任务每 FLUSH_INTERVAL 秒合并推送一次：
+    单条仍发 new_log，多条合并为一个 new_log_batch（列表）。
+    前端跟不上时缓冲区满则丢弃最旧的记录，丢弃条数随下一次推送以 log_dropped 汇总上报。
+    """
+
+    FLUSH_INTERVAL = 0.05
+    BUFFER_SIZE = 1024
 
     def __init__(self, socketio: SocketIO):
         super().__init__()
         self.socketio = socketio
+        self.addFilter(_not_framework_record)
+        self._buf = deque(maxlen=self.BUFFER_SIZE)
+        self._flush_pending = False
+        self._dropped = 0
 
     def emit(self, record):
         try:
-            msg = self.format(record)
-            if _is_flask_noise(msg):
+            # 只看 getMessage()，不经过 Formatter，噪音记录无需格式化
+            if _is_flask_noise(record.getMessage()):
                 return
+            msg = self.format(record)
             color = color_for_log(record.levelno, msg)
-            self.socketio.emit("new_log", {"message": msg, "color": color})
+            if len(self._buf) >= self.BUFFER_SIZE:
+                self._dropped += 1  # deque 满时 append 会挤掉最旧的一条
+            self._buf.append({"message": msg, "color": color})
+            if not self._flush_pending:
+                self._flush_pending = True
+                self.socketio.start_background_task(self._delayed_flush)
         except Exception:
             self.handleError(record)
 
+    def _delayed_flush(self):
+        self.socketio.sleep(self.FLUSH_INTERVAL)
+        self.acquire()
+        try:
+            self._flush_pending = False
+            items, dropped = self._take()
+        finally:
+            self.release()
+        self._send(items, dropped)
+
+    def flush(self):
+        self.acquire()
+        try:
+            items, dropped = self._take()
+        finally:
+            self.release()
+        self._send(items, dropped)
+
+    def _take(self):
+        """取走缓冲记录与丢弃计数（调用方持有处理器锁，与 emit 互斥）。"""
+        items = list(self._buf)
+        self._buf.clear()
+        dropped, self._dropped = self._dropped, 0
+        return items, dropped
+
+    def _send(self, items, dropped):
+        """在锁外推送，避免网络 I/O 阻塞其他线程的 emit。"""
+        if dropped:
+            self.socketio.emit("log_dropped", {"dropped": dropped})
+        if not items:
+            return
+        if len(items) == 1:
+            self.socketio.emit("new_log", items[0])
+        else:
+            self.socketio.emit("new_log_batch", items)
+
 
 class QueueLogHandler(logging.Handler):
     """通过队列转发日志（Worker 子进程使用）。原 _SocketLogHandler。"""
@@ -34,12 +100,14 @@ class QueueLogHandler(logging.Handler):
     def __init__(self, out_queue):
         super().__init__()
         self.out_queue = out_queue
+        self.addFilter(_not_framework_record)
 
     def emit(self, record):
         try:
-            msg = self.format(record)
-            if _is_flask_noise(msg):
+            # 只看 getMessage()，不经过 Formatter，噪音记录无需格式化
+            if _is_flask_noise(record.getMessage()):
                 return
+            msg = self.format(record)
             color = color_for_log(record.levelno, msg)
             self.out_queue.put(("new_log", {"message": msg, "color": color}))
         except Exception:
@@ -1,22 +1,60 @@
 import os
+import sys
+import queue
+import atexit
 import logging
+import logging.handlers
 from datetime import datetime
 from src.config import reader as config
 
+# 日志队列容量：超出时丢弃最旧的记录，保证调用方（事件线程/下单路径）永不阻塞
+LOG_QUEUE_SIZE = 10000
+
+# Web 框架自身的 logger：INFO 及以下全是访问/轮询噪音
+FRAMEWORK_LOGGERS = ("werkzeug", "flask", "socketio", "engineio")
+
+# 当前进程的后台写日志监听器（setup_logger 创建，退出时停止并冲刷队列）
+_listener = None
+
+
+class DropOldestQueueHandler(logging.handlers.QueueHandler):
+    """有界队列处理器：队列满时丢弃最旧的一条再入队。"""
+
+    def prepare(self, record):
+        # 同进程队列，无需序列化：消息格式化（%-参数合并）推迟到监听线程
+        return record
+
+    def enqueue(self, record):
+        while True:
+            try:
+                self.queue.put_nowait(record)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    pass
+
+
 def setup_logger():
     """
     设置全局日志配置。
     日志目录: log/{CTP_NAME}/
     日志文件: {CTP_NAME}_{Date}.log
+    文件/控制台写入由后台 QueueListener 线程完成，调用 log_* 只是一次入队。
+    重复调用不会再挂一套处理器。
     """
+    global _listener
+    if _listener is not None:
+        return
+
     ctp_name = config.CTP_NAME
     
     # 创建日志目录
     log_root = os.path.join(config.PROJECT_ROOT, "log")
     log_dir = os.path.join(log_root, ctp_name)
     
-    if not os.path.exists(log_dir):
-        os.makedirs(log_dir)
+    os.makedirs(log_dir, exist_ok=True)
         
     # 日志文件名
     today_str = datetime.now().strftime("%Y-%m-%d")
@@ -26,6 +64,10 @@ def setup_logger():
     # 配置日志
     logger = logging.getLogger()
     logger.setLevel(logging.INFO)
+
+    # 框架 logger 只放行 WARNING 及以上：噪音在创建记录前就被丢弃，不再逐条进入处理器
+    for name in FRAMEWORK_LOGGERS:
+        logging.getLogger(name).setLevel(logging.WARNING)
     
     # 格式化器
     formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(module)s - %(message)s')
@@ -37,29 +79,36 @@ def setup_logger():
     # 过滤掉 Flask/Werkzeug 相关的日志，不写入文件
     class NoFlaskFilter(logging.Filter):
         def filter(self, record):
-            name = record.name
-            if name and (name.startswith('werkzeug') or name.startswith('flask') or name.startswith('socketio') or name.startswith('engineio')):
-                return False
-            return True
+            return not record.name.startswith(FRAMEWORK_LOGGERS)
 
     file_handler.addFilter(NoFlaskFilter())
-    logger.addHandler(file_handler)
     
     # 流处理器 (控制台)
     stream_handler = logging.StreamHandler()
     stream_handler.setFormatter(formatter)
-    logger.addHandler(stream_handler)
+
+    # 标准输出回显（原 log_* 中的 print）：控制台已有完整输出，仅回显 WARNING 及以上
+    echo_handler = logging.StreamHandler(sys.stdout)
+    echo_handler.setLevel(logging.WARNING)
+    echo_handler.setFormatter(logging.Formatter('[%(levelname)s] %(message)s'))
+    echo_handler.addFilter(lambda record: record.name == "root")  # 仅回显 log_* 输出
+
+    # 异步写出：根 logger 只挂一个入队处理器，I/O 在监听线程中完成
+    log_queue = queue.Queue(LOG_QUEUE_SIZE)
+    logger.addHandler(DropOldestQueueHandler(log_queue))
+    _listener = logging.handlers.QueueListener(
+        log_queue, file_handler, stream_handler, echo_handler, respect_handler_level=True
+    )
+    _listener.start()
+    atexit.register(_listener.stop)
     
     logging.info(f"日志初始化完成。日志文件: {log_filepath}")
 
-def log_info(msg: str):
-    logging.info(msg)
-    print(f"[INFO] {msg}")
+def log_info(msg: str, *args):
+    logging.info(msg, *args)
 
-def log_warning(msg: str):
-    logging.warning(msg)
-    print(f"[WARNING] {msg}")
+def log_warning(msg: str, *args):
+    logging.warning(msg, *args)
 
-def log_error(msg: str):
-    logging.error(msg)
-    print(f"[ERROR] {msg}")
+def log_error(msg: str, *args):
+    logging.error(msg, *args)
@@ -64,6 +64,7 @@ class TestSocketIOHandler:
         handler.setFormatter(logging.Formatter("%(message)s"))
 
         handler.emit(self._make_record("Engine started"))
+        handler.flush()
 
         sio.emit.assert_called_once_with(
             "new_log", {"message": "Engine started", "color": "#cccccc"}
@@ -75,6 +76,7 @@ class TestSocketIOHandler:
         handler.setFormatter(logging.Formatter("%(message)s"))
 
         handler.emit(self._make_record("Something failed", logging.ERROR))
+        handler.flush()
 
         sio.emit.assert_called_once()
         call_args = sio.emit.call_args
@@ -86,7 +88,53 @@ class TestSocketIOHandler:
         handler.setFormatter(logging.Formatter("%(message)s"))
 
         handler.emit(self._make_record("GET /status HTTP/1.1 200"))
+        handler.flush()
 
+        sio.start_background_task.assert_not_called()
+        sio.emit.assert_not_called()
+
+    def test_flush_batches_buffered_records(self):
+        sio = MagicMock()
+        handler = SocketIOHandler(sio)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+
+        handler.emit(self._make_record("first"))
+        handler.emit(self._make_record("second"))
+        sio.emit.assert_not_called()
+        sio.start_background_task.assert_called_once()
+
+        handler.flush()
+
+        event, items = sio.emit.call_args[0]
+        assert event == "new_log_batch"
+        assert [item["message"] for item in items] == ["first", "second"]
+
+    def test_flush_reports_dropped_records(self, monkeypatch):
+        monkeypatch.setattr(SocketIOHandler, "BUFFER_SIZE", 4)
+        sio = MagicMock()
+        handler = SocketIOHandler(sio)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+
+        for i in range(7):
+            handler.handle(self._make_record(f"line {i}"))
+        handler.flush()
+
+        (dropped_event, dropped_payload), (batch_event, items) = [c[0] for c in sio.emit.call_args_list]
+        assert (dropped_event, dropped_payload) == ("log_dropped", {"dropped": 3})
+        assert batch_event == "new_log_batch"
+        assert [item["message"] for item in items] == ["line 3", "line 4", "line 5", "line 6"]
+
+    def test_handle_filters_framework_logger(self):
+        sio = MagicMock()
+        handler = SocketIOHandler(sio)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        record = self._make_record("Running on http://127.0.0.1:5000")
+        record.name = "werkzeug"
+
+        handler.handle(record)
+        handler.flush()
+
+        sio.start_background_task.assert_not_called()
         sio.emit.assert_not_called()
 
 
@@ -9,7 +9,11 @@ from pathlib import Path
 _root = Path(__file__).resolve().parent.parent
 _lib = _root / "lib"
 
-for subdir in ("vnpy", "vnpy_ctp", "vnpy_ctptest"):
-    p = str(_lib / subdir)
-    if p not in sys.path:
-        sys.path.insert(0, p)
+# Later subdirs take precedence (same order as the previous per-item insert(0)).
+# Missing subdirs are skipped so they don't add dead entries to every import search.
+_existing = set(sys.path)
+_candidates = [
+    str(p) for p in (_lib / subdir for subdir in ("vnpy_ctptest", "vnpy_ctp", "vnpy"))
+    if p.is_dir()
+]
+sys.path[:0] = [p for p in _candidates if p not in _existing]
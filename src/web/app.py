@@ -42,6 +42,11 @@ def _relay_new_log(data):
     socketio.emit("new_log", data)
 
 
+@socketio.on("new_log_batch")
+def _relay_new_log_batch(data):
+    socketio.emit("new_log_batch", data)
+
+
 @socketio.on("worker_status")
 def _relay_worker_status(data):
     socketio.emit("worker_status", data)
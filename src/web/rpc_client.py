@@ -2,6 +2,9 @@ import json
 import socket
 import uuid
 
+# 单个响应帧（以换行结尾）的最大长度
+_MAX_FRAME = 65536
+
 
 class RpcClient:
     def __init__(self, host: str, port: int):
@@ -18,19 +21,14 @@ class RpcClient:
 
         data = (json.dumps(req, ensure_ascii=False) + "\n").encode("utf-8")
 
-        with socket.create_connection((self.host, self.port), timeout=timeout) as s:
+        with socket.create_connection((self.host, self.port), timeout=timeout) as s, s.makefile("rb") as rfile:
+            # 请求帧很小，关闭 Nagle 避免等待合包
+            s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
             s.sendall(data)
             s.shutdown(socket.SHUT_WR)
+            raw = rfile.readline(_MAX_FRAME)
 
-            raw = b""
-            s.settimeout(timeout)
-            while b"\n" not in raw and len(raw) < 65536:
-                chunk = s.recv(4096)
-                if not chunk:
-                    break
-                raw += chunk
-
-        line = raw.split(b"\n", 1)[0].decode("utf-8", errors="replace").strip()
+        line = raw.decode("utf-8", errors="replace").strip()
         if not line:
             return {"ok": False, "error": "empty_response"}
         try:
@@ -31,7 +31,7 @@ import queue
 import logging
 import traceback
 import threading
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
 
 from src.core.engine import TestEngine
 from src.core.server import CommandServer
@@ -46,14 +46,50 @@ except Exception:
     socketio_client = None
 
 
+# 测试项编号 -> 用例函数；导入时构建一次，提交用例时直接查表
+_CASE_MAP = {
+    "2.1.1": cases.test_2_1_1_connectivity,
+    "2.1.2.1": cases.test_2_1_2_1_open,
+    "2.1.2.2": cases.test_2_1_2_2_close,
+    "2.1.2.3": cases.test_2_1_2_3_cancel,
+    "2.2.1.1": cases.test_2_2_1_1_connect_status,
+    "2.2.1.2": cases.test_2_2_1_2_disconnect,
+    "2.2.1.3": cases.test_2_2_1_3_reconnect,
+    # 2.2.2.1 和 2.2.2.2 已合并到 2.3.1.1 和 2.3.1.3
+    "2.2.3.1": cases.test_2_2_3_1_repeat_open,
+    "2.2.3.2": cases.test_2_2_3_2_repeat_close,
+    "2.2.3.3": cases.test_2_2_3_3_repeat_cancel,
+    "2.3.1.1": cases.test_2_3_1_1_order_threshold,  # 包含原 2.2.2.1 报单统计
+    "2.3.1.3": cases.test_2_3_1_3_cancel_threshold, # 包含原 2.2.2.2 撤单统计
+    "2.3.1.5": cases.test_2_3_1_5_repeat_threshold,
+    "2.4.1.1": cases.test_2_4_1_1_code_error,
+    "2.4.1.2": cases.test_2_4_1_2_price_error,
+    "2.4.1.3": cases.test_2_4_1_3_volume_error,
+    "2.4.2.1": cases.test_2_4_2_1_fund_error,
+    "2.4.2.2": cases.test_2_4_2_2_pos_error,
+    "2.4.2.3": cases.test_2_4_2_3_market_error,
+    "2.5.1.1": cases.test_2_5_1_1_limit_perms,
+    "2.5.1.2": cases.test_2_5_1_2_pause_strategy,
+    "2.5.2.1": cases.test_2_5_2_1_cancel_part,
+    "2.5.2.2": cases.test_2_5_2_2_cancel_all,
+    "2.6.1": cases.test_2_6_1_log_record,
+}
+
 
 class WorkerController:
+    # 日志推送的合并窗口（秒）与单批最大条数
+    EMIT_FLUSH_INTERVAL = 0.05
+    EMIT_BATCH_SIZE = 200
+    # DISCONNECT/RECONNECT 请求等待控制线程完成的最长时间（秒）
+    CONTROL_WAIT_SECONDS = 3.0
+
     def __init__(self, web_socketio_url: str = "http://127.0.0.1:5006"):
         self.web_socketio_url = web_socketio_url
         self.engine = TestEngine()
         self.engine.connect()
 
-        self.executor = ThreadPoolExecutor(max_workers=1)
+        # 用例串行执行：run_case 只负责入队，由专用线程逐个取出执行
+        self._case_queue = queue.Queue()
         self.task_lock = threading.Lock()
         self.current_case_id = None
         self.last_error = None
@@ -78,6 +114,7 @@ class WorkerController:
         threading.Thread(target=self._socketio_connect_loop, daemon=True).start()
         threading.Thread(target=self._socketio_emit_loop, daemon=True).start()
         threading.Thread(target=self._heartbeat_loop, daemon=True).start()
+        threading.Thread(target=self._case_loop, daemon=True).start()
 
     def _socketio_connect_loop(self):
         if not self.sio:
@@ -92,17 +129,43 @@ class WorkerController:
                 time.sleep(2)
 
     def _socketio_emit_loop(self):
+        out_queue = self.out_queue
         while not self._stop_event.is_set():
             try:
-                event, payload = self.out_queue.get(timeout=0.5)
+                items = [out_queue.get(timeout=0.5)]
             except queue.Empty:
                 continue
+            # 稍等片刻让日志积攒，再一次取出队列中已有的记录（polling 传输下每次 emit 都是一次 HTTP 请求）
+            self._stop_event.wait(self.EMIT_FLUSH_INTERVAL)
+            while len(items) < self.EMIT_BATCH_SIZE:
+                try:
+                    items.append(out_queue.get_nowait())
+                except queue.Empty:
+                    break
             try:
                 if self.sio and self.sio.connected:
-                    self.sio.emit(event, payload)
+                    self._emit_items(items)
             except Exception:
                 pass
 
+    def _emit_items(self, items):
+        """按原顺序推送；连续的 new_log 合并为一个 new_log_batch（单条仍发 new_log）。"""
+        logs = []
+        for event, payload in items:
+            if event == "new_log":
+                logs.append(payload)
+                continue
+            self._emit_logs(logs)
+            logs = []
+            self.sio.emit(event, payload)
+        self._emit_logs(logs)
+
+    def _emit_logs(self, logs):
+        if len(logs) == 1:
+            self.sio.emit("new_log", logs[0])
+        elif logs:
+            self.sio.emit("new_log_batch", logs)
+
     def _heartbeat_loop(self):
         while not self._stop_event.is_set():
             try:
@@ -163,16 +226,24 @@ class WorkerController:
 
     def run_case(self, case_id: str) -> bool:
         case_id = (case_id or "").strip()
-        func = self._case_map().get(case_id)
+        func = _CASE_MAP.get(case_id)
         if not func:
             raise ValueError(f"未找到测试项 {case_id}")
 
         if not self.task_lock.acquire(blocking=False):
             return False
 
-        self.executor.submit(self._wrapped_case, case_id, func)
+        self._case_queue.put_nowait((case_id, func))
         return True
 
+    def _case_loop(self):
+        while not self._stop_event.is_set():
+            try:
+                case_id, func = self._case_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            self._wrapped_case(case_id, func)
+
     def _wrapped_case(self, case_id: str, func):
         start = time.time()
         self.current_case_id = case_id
@@ -182,9 +253,9 @@ class WorkerController:
                 self.engine.session_order_ids.clear()
             if self.sio and self.sio.connected:
                 self.sio.emit("case_started", {"case_id": case_id, "started_at": time.time()})
-            log_info(f"=== 开始执行: {case_id} ===")
+            log_info("=== 开始执行: %s ===", case_id)
             func(self.engine)
-            log_info(f"=== 执行结束: {case_id} ===")
+            log_info("=== 执行结束: %s ===", case_id)
             if self.sio and self.sio.connected:
                 self.sio.emit(
                     "case_finished",
@@ -192,7 +263,7 @@ class WorkerController:
                 )
         except Exception as e:
             self.last_error = str(e)
-            log_error(f"测试执行异常: {e}")
+            log_error("测试执行异常: %s", e)
             log_error(traceback.format_exc())
             if self.sio and self.sio.connected:
                 self.sio.emit(
@@ -204,35 +275,6 @@ class WorkerController:
             self.current_case_id = None
             self.task_lock.release()
 
-    def _case_map(self):
-        return {
-            "2.1.1": cases.test_2_1_1_connectivity,
-            "2.1.2.1": cases.test_2_1_2_1_open,
-            "2.1.2.2": cases.test_2_1_2_2_close,
-            "2.1.2.3": cases.test_2_1_2_3_cancel,
-            "2.2.1.1": cases.test_2_2_1_1_connect_status,
-            "2.2.1.2": cases.test_2_2_1_2_disconnect,
-            "2.2.1.3": cases.test_2_2_1_3_reconnect,
-            # 2.2.2.1 和 2.2.2.2 已合并到 2.3.1.1 和 2.3.1.3
-            "2.2.3.1": cases.test_2_2_3_1_repeat_open,
-            "2.2.3.2": cases.test_2_2_3_2_repeat_close,
-            "2.2.3.3": cases.test_2_2_3_3_repeat_cancel,
-            "2.3.1.1": cases.test_2_3_1_1_order_threshold,  # 包含原 2.2.2.1 报单统计
-            "2.3.1.3": cases.test_2_3_1_3_cancel_threshold, # 包含原 2.2.2.2 撤单统计
-            "2.3.1.5": cases.test_2_3_1_5_repeat_threshold,
-            "2.4.1.1": cases.test_2_4_1_1_code_error,
-            "2.4.1.2": cases.test_2_4_1_2_price_error,
-            "2.4.1.3": cases.test_2_4_1_3_volume_error,
-            "2.4.2.1": cases.test_2_4_2_1_fund_error,
-            "2.4.2.2": cases.test_2_4_2_2_pos_error,
-            "2.4.2.3": cases.test_2_4_2_3_market_error,
-            "2.5.1.1": cases.test_2_5_1_1_limit_perms,
-            "2.5.1.2": cases.test_2_5_1_2_pause_strategy,
-            "2.5.2.1": cases.test_2_5_2_1_cancel_part,
-            "2.5.2.2": cases.test_2_5_2_2_cancel_all,
-            "2.6.1": cases.test_2_6_1_log_record,
-        }
-
     def handle_rpc_request(self, req: dict) -> dict:
         request_id = req.get("request_id")
         req_type = str(req.get("type", "")).upper()
@@ -310,6 +352,8 @@ class WorkerController:
                     data_to_save["cancel_monitor_threshold"] = read_config.CANCEL_MONITOR_THRESHOLD
                 
                 read_config.save_yaml_config(read_config.CONFIG_YAML_PATH, data_to_save)
+                if test_symbol:
+                    self.engine.reload_config()
                 
                 return {
                     "request_id": request_id, 
@@ -342,11 +386,9 @@ class WorkerController:
                 accepted = self.run_case(str(payload.get("case_id", "")))
                 return {"request_id": request_id, "ok": True, "data": {"accepted": bool(accepted)}}
             if req_type == "DISCONNECT":
-                self.engine.disconnect()
-                return {"request_id": request_id, "ok": True}
+                return self._control_response(request_id, self.engine.async_disconnect())
             if req_type == "RECONNECT":
-                self.engine.reconnect()
-                return {"request_id": request_id, "ok": True}
+                return self._control_response(request_id, self.engine.async_reconnect())
             if req_type == "PAUSE":
                 self.engine.pause()
                 return {"request_id": request_id, "ok": True}
@@ -354,11 +396,24 @@ class WorkerController:
         except Exception as e:
             return {"request_id": request_id, "ok": False, "error": str(e)}
 
+    def _control_response(self, request_id, future: Future) -> dict:
+        """
+        短暂等待连接控制任务：失败时把异常返回给 Web 端；
+        超时仍在执行则视为已受理（结果由控制线程记录日志）。
+        """
+        try:
+            future.result(timeout=self.CONTROL_WAIT_SECONDS)
+        except FutureTimeoutError:
+            return {"request_id": request_id, "ok": True, "data": {"pending": True}}
+        except Exception as e:
+            return {"request_id": request_id, "ok": False, "error": str(e)}
+        return {"request_id": request_id, "ok": True}
+
     def disconnect(self):
-        self.engine.disconnect()
+        self.engine.async_disconnect()
 
     def reconnect(self):
-        self.engine.reconnect()
+        self.engine.async_reconnect()
 
     def pause(self):
         self.engine.pause()
@@ -404,7 +459,7 @@ def main():
     except KeyboardInterrupt:
         log_info("交易进程收到退出信号。")
     except Exception as e:
-        log_error(f"交易进程发生未捕获异常: {e}")
+        log_error("交易进程发生未捕获异常: %s", e)
         log_error(traceback.format_exc())
     finally:
         try: